@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class QnaAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qna_app'
+
+    def ready(self):
+        # Connects the signals that invalidate cached users
+        from . import authentication  # noqa: F401
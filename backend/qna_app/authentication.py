@@ -0,0 +1,130 @@
+import copy
+import logging
+import os
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+logger = logging.getLogger(__name__)
+
+# Only saves that can touch these fields invalidate cached users; login's last_login update does not.
+AUTH_FIELDS = {'password', 'is_active'}
+
+
+class UserCache:
+    """In-process TTL cache of users, invalidated across all processes on the host.
+
+    Invalidation appends a byte to a stamp file. Every lookup compares the
+    file's size with the one seen when the cache was last cleared, so one stat
+    call is enough to notice that another worker saved or deleted a user.
+    Hosts that don't share the stamp file fall back on the TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = None
+        self._stamp = None
+
+    @property
+    def config(self):
+        return settings.AUTH_USER_CACHE
+
+    def _read_stamp(self):
+        try:
+            return os.stat(self.config['STAMP_PATH']).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _current(self):
+        stamp = self._read_stamp()
+        with self._lock:
+            if self._cache is None or stamp != self._stamp:
+                self._cache = TTLCache(maxsize=self.config['MAX_SIZE'], ttl=self.config['TTL_SECONDS'])
+                self._stamp = stamp
+            return self._cache
+
+    def get_or_load(self, user_id, load):
+        """Return (user, cached); a user loaded while an invalidation ran is not kept.
+
+        Every caller gets its own copy, so a request that changes its user
+        (e.g. login setting last_login) can't change what other requests see.
+        """
+        cache = self._current()
+        with self._lock:
+            user = cache.get(user_id)
+        if user is not None:
+            return copy.copy(user), True
+        user = load()
+        # If the cache was cleared meanwhile this writes into the discarded generation
+        with self._lock:
+            cache[user_id] = copy.copy(user)
+        return user, False
+
+    def invalidate(self):
+        path = self.config['STAMP_PATH']
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'ab') as stamp_file:
+            stamp_file.write(b'.')
+        with self._lock:
+            self._cache = None
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that looks users up in `user_cache` before the database.
+
+    The active and password-revocation checks still run on every request,
+    against the cached user, which is dropped as soon as a user is saved or deleted.
+    """
+
+    def get_user(self, validated_token):
+        if settings.AUTH_USER_CACHE['TTL_SECONDS'] <= 0:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        def load():
+            return JWTAuthentication.get_user(self, validated_token)
+
+        user, cached = user_cache.get_or_load(user_id, load)
+        if not cached:
+            # Loaded and checked by JWTAuthentication
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user(sender, instance, created=False, update_fields=None, **kwargs):
+    # New users can't be cached yet
+    if created or (update_fields is not None and not AUTH_FIELDS.intersection(update_fields)):
+        return
+    logger.info(f"Invalidating cached users after saving user {instance.pk}")
+    # After commit, so no worker can re-cache the old row in between
+    transaction.on_commit(user_cache.invalidate)
+
+
+@receiver(post_delete, sender=get_user_model())
+def invalidate_deleted_user(sender, instance, **kwargs):
+    transaction.on_commit(user_cache.invalidate)
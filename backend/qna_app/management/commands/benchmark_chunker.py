@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from qna_app.utils.text_chunker import TextChunker
+
+WORDS = (
+    "the document describes a process for reviewing quarterly results and "
+    "each section lists owners dates risks and follow up actions agreed by "
+    "the committee including budget approvals hiring plans and vendor terms"
+).split()
+
+
+def generate_text(size_bytes: int, seed: int = 42) -> str:
+    """Build prose-like text of roughly `size_bytes` with sentences and paragraphs."""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size_bytes:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24)))
+            sentences.append(sentence.capitalize() + rng.choice(".?!"))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size_bytes]
+
+
+class Command(BaseCommand):
+    help = "Compare chunking throughput of TextChunker and LangChain's RecursiveCharacterTextSplitter."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10, 50],
+                            help="Input sizes in MB.")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Runs per size; the best time is reported.")
+        parser.add_argument('--tokens', action='store_true',
+                            help="Also benchmark token-based sizing (needs CHUNK_TOKEN_ENCODING or cl100k_base).")
+
+    def handle(self, *args, **options):
+        splitters = [('TextChunker', TextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP))]
+        if options['tokens']:
+            encoding = settings.CHUNK_TOKEN_ENCODING or 'cl100k_base'
+            splitters.append((
+                f'TextChunker[{encoding}]',
+                TextChunker(settings.CHUNK_SIZE // 4, settings.CHUNK_OVERLAP // 4, encoding_name=encoding),
+            ))
+        try:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            splitters.append(('RecursiveCharacterTextSplitter', RecursiveCharacterTextSplitter(
+                chunk_size=settings.CHUNK_SIZE,
+                chunk_overlap=settings.CHUNK_OVERLAP,
+                length_function=len,
+            )))
+        except ImportError:
+            self.stdout.write(self.style.WARNING("langchain_text_splitters not installed; skipping baseline"))
+
+        self.stdout.write(f"{'size':>6}  {'splitter':<34} {'chunks':>8} {'seconds':>9} {'MB/s':>8}")
+        for size_mb in options['sizes']:
+            text = generate_text(size_mb * 1024 * 1024)
+            for name, splitter in splitters:
+                best = None
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    chunks = splitter.split_text(text)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                self.stdout.write(
+                    f"{size_mb:>4}MB  {name:<34} {len(chunks):>8} {best:>9.3f} {size_mb / best:>8.1f}"
+                )
@@ -0,0 +1,98 @@
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.mixins import ListModelMixin
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from qna_app.middleware import LargeResponseGZipMiddleware
+from qna_app.models import Document, QASession
+from qna_app.utils.fast_json import ORJSONRenderer
+from qna_app.views import DocumentListView, QAHistoryView
+
+ANSWER = (
+    "According to section 4.2 the notice period is ninety days, and either party may terminate "
+    "earlier for material breach after a thirty day cure period. "
+) * 3
+
+
+def variants(view_class, page_size):
+    """The view as shipped, and the same view on DRF's JSONRenderer and full serializers."""
+    pagination = type('BenchmarkPagination', (PageNumberPagination,), {'page_size': page_size})
+    fast = type(f'Fast{view_class.__name__}', (view_class,), {
+        'pagination_class': pagination,
+        'renderer_classes': [ORJSONRenderer],
+    })
+    baseline = type(f'Baseline{view_class.__name__}', (view_class,), {
+        'pagination_class': pagination,
+        'renderer_classes': [JSONRenderer],
+        'list': ListModelMixin.list,
+    })
+    return [('serializer + JSONRenderer', baseline.as_view()), ('values() + orjson', fast.as_view())]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request CPU of the document and Q&A history list endpoints with full serializers "
+        "and DRF's JSONRenderer versus .values() and orjson, and the effect of gzip. Runs against "
+        "throwaway rows in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[20, 500])
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Requests per variant; the median CPU time is reported.")
+
+    def handle(self, *args, **options):
+        rows = max(options['page_sizes'])
+        with transaction.atomic():
+            user = self.create_fixtures(rows)
+            self.stdout.write(f"{'endpoint':<12} {'items':>5}  {'variant':<26} {'cpu ms':>8} "
+                              f"{'bytes':>9} {'gzip cpu ms':>11} {'gzip bytes':>10}")
+            for label, view_class in [('documents', DocumentListView), ('qa history', QAHistoryView)]:
+                for page_size in options['page_sizes']:
+                    for name, view in variants(view_class, page_size):
+                        self.stdout.write(f"{label:<12} {page_size:>5}  {name:<26} "
+                                          + self.measure(view, user, options['requests']))
+            transaction.set_rollback(True)
+
+    def create_fixtures(self, rows):
+        user = User.objects.create(username=f"benchmark-{uuid.uuid4().hex[:8]}")
+        documents = Document.objects.bulk_create([
+            Document(user=user, title=f"Quarterly report {i}.pdf", file=f"documents/report_{i}.pdf",
+                     file_type='pdf', file_size=250_000 + i, processed=True, vector_store_id=f"doc_bench_{i}")
+            for i in range(rows)
+        ])
+        QASession.objects.bulk_create([
+            QASession(user=user, document=documents[i], question=f"What is the notice period in report {i}?",
+                      answer=ANSWER, confidence_score=0.82, response_time=1.4)
+            for i in range(rows)
+        ])
+        return user
+
+    def measure(self, view, user, requests):
+        factory = APIRequestFactory()
+        gzip = LargeResponseGZipMiddleware(lambda request: HttpResponse())
+        cpu, gzip_cpu = [], []
+        for _ in range(requests):
+            request = factory.get('/', HTTP_ACCEPT_ENCODING='gzip')
+            force_authenticate(request, user=user)
+            started = time.process_time()
+            response = view(request).render()
+            cpu.append(time.process_time() - started)
+            size = len(response.content)
+
+            started = time.process_time()
+            compressed = gzip.process_response(request, response)
+            gzip_cpu.append(time.process_time() - started)
+
+        def median(values):
+            return sorted(values)[len(values) // 2] * 1000
+
+        return (f"{median(cpu):>8.2f} {size:>9} {median(gzip_cpu):>11.2f} "
+                f"{len(compressed.content):>10}")
@@ -0,0 +1,108 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from qna_app.models import Document
+from qna_app.utils.storage import directory_size, remove_store
+from qna_app.utils.vector_index import VectorIndex, compact_search, quantize, store_path
+
+# (name, storage, keep full-precision copy) of the stores built for the comparison
+LAYOUTS = (
+    ('float32', 'float32', False),
+    ('float16', 'float16', False),
+    ('float16_full', 'float16', True),
+    ('int8', 'int8', False),
+    ('int8_full', 'int8', True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall@k, on-disk bytes per chunk and search time of float16/int8 embedding storage "
+        "against exact float32 search. A scratch store is built in every layout to measure its size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('document_id')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--noise', type=float, default=0.5,
+                            help="Length of the random perturbation added to each sampled chunk embedding.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        try:
+            document = Document.objects.get(id=options['document_id'])
+        except (Document.DoesNotExist, ValueError):
+            raise CommandError(f"Document {options['document_id']} not found")
+        if not document.vector_store_id:
+            raise CommandError("Document has no vector store")
+
+        index = VectorIndex(document.vector_store_id)
+        chunk_count = index.manifest.get('chunks')
+        if not chunk_count:
+            raise CommandError("Store has no manifest; re-index the document first")
+        if index.storage != 'float32' and not index.has_full_precision:
+            raise CommandError(
+                "Store keeps no full-precision vectors to compare against; re-index it with "
+                "EMBEDDING_STORAGE=float32 or EMBEDDING_RESCORE_FULL_PRECISION=True first"
+            )
+        vectors = index.get_embeddings(range(chunk_count))
+        dimensions = vectors.shape[1]
+        disk = self.measure_disk(index, vectors, chunk_count)
+
+        queries = index.sample_queries(options['queries'], options['noise'], options['seed'])
+
+        k = options['k']
+        exact = [set(np.argsort(-(vectors @ query))[:k].tolist()) for query in queries]
+        candidates = k * settings.EMBEDDING_RESCORE_CANDIDATES
+
+        self.stdout.write(f"{chunk_count} chunks x {dimensions} dims, {len(queries)} queries, k={k}, "
+                          f"{candidates} candidates re-scored with a float32 copy")
+        self.stdout.write(f"{'storage':<34} {'disk B/chunk':>12} {'scanned B/chunk':>15} "
+                          f"{'recall@k':>9} {'mean ms':>9}")
+        self.stdout.write(f"{'float32 Chroma (exact)':<34} {disk['float32']:>12} {dimensions * 4:>15} "
+                          f"{1.0:>9.3f} {'-':>9}")
+
+        for storage in ('float16', 'int8'):
+            compact, scales = quantize(vectors, storage)
+            scanned = compact.itemsize * dimensions + (4 if scales is not None else 0)
+            for label, full, layout in (
+                (f"{storage} single pass", None, storage),
+                (f"{storage} + float32 re-scoring", vectors, f"{storage}_full"),
+            ):
+                found = []
+                started = time.perf_counter()
+                for query in queries:
+                    ranked = compact_search(query, compact, scales, full, k, candidates=candidates)
+                    found.append({row for row, _ in ranked})
+                elapsed = (time.perf_counter() - started) / len(queries)
+                recall = sum(len(a & b) / k for a, b in zip(found, exact)) / len(queries)
+                self.stdout.write(f"{label:<34} {disk[layout]:>12} {scanned:>15} "
+                                  f"{recall:>9.3f} {elapsed * 1000:>9.2f}")
+
+        self.stdout.write(
+            f"\ndisk B/chunk is the whole store (vectors, texts, offsets and index files) divided by the "
+            f"chunk count. Float32 re-scoring (EMBEDDING_RESCORE_FULL_PRECISION=True) keeps a float32 copy "
+            f"next to the compact vectors, adding {dimensions * 4} bytes per chunk: it trades the disk "
+            f"saving for exact scores. scanned B/chunk is what every query reads."
+        )
+
+    def measure_disk(self, index, vectors, chunk_count):
+        """Build a scratch copy of the store in every layout and return its bytes per chunk."""
+        chunks = index.get_chunks(range(chunk_count))
+        section_size = index.manifest.get('section_size') or 0
+        sizes = {}
+        for name, storage, full_precision in LAYOUTS:
+            scratch_id = f"{index.vector_store_id[:40]}_eval_{name}"
+            remove_store(scratch_id)
+            try:
+                VectorIndex.build(scratch_id, chunks, vectors, section_size=section_size,
+                                  storage=storage, full_precision=full_precision)
+                sizes[name] = round(directory_size(store_path(scratch_id)) / chunk_count)
+            finally:
+                remove_store(scratch_id)
+        return sizes
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from qna_app.models import Document
+from qna_app.utils.model_router import LatencyStats
+from qna_app.utils.vector_index import VectorIndex
+
+
+class Command(BaseCommand):
+    help = "Compare recall@k and latency of hierarchical (section-first) and flat retrieval for a document."
+
+    def add_arguments(self, parser):
+        parser.add_argument('document_id')
+        parser.add_argument('--queries', type=int, default=200,
+                            help="Number of synthetic queries sampled from the document's chunks.")
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--top-sections', type=int, nargs='+', default=[2, 4, 8, 16])
+        parser.add_argument('--noise', type=float, default=0.5,
+                            help="Length of the random perturbation added to each sampled chunk embedding.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            document = Document.objects.get(id=options['document_id'])
+        except (Document.DoesNotExist, ValueError):
+            raise CommandError(f"Document {options['document_id']} not found")
+        if not document.vector_store_id:
+            raise CommandError("Document has no vector store")
+
+        index = VectorIndex(document.vector_store_id)
+        if not index.hierarchical:
+            raise CommandError(
+                "Document has no section index; it is only built for documents with at least "
+                "HIERARCHICAL_INDEX_MIN_CHUNKS chunks"
+            )
+
+        chunk_count = index.manifest['chunks']
+        queries = index.sample_queries(options['queries'], options['noise'], options['seed'])
+
+        k = options['k']
+        flat_results, flat_seconds = self._run(index, queries, k, flat=True)
+        self.stdout.write(
+            f"{chunk_count} chunks in {index.manifest['sections']} sections, "
+            f"{len(queries)} queries, k={k}"
+        )
+        self.stdout.write(f"{'mode':<22} {'recall@k':>9} {'mean ms':>9} {'p95 ms':>9}")
+        self.stdout.write(self._row('flat', 1.0, flat_seconds))
+
+        for top_sections in options['top_sections']:
+            results, seconds = self._run(index, queries, k, top_sections=top_sections)
+            recall = sum(
+                len(set(found) & set(expected)) / max(len(expected), 1)
+                for found, expected in zip(results, flat_results)
+            ) / len(queries)
+            self.stdout.write(self._row(f"hierarchical top={top_sections}", recall, seconds))
+
+    def _run(self, index, queries, k, **search_kwargs):
+        results = []
+        seconds = []
+        for query in queries:
+            started = time.perf_counter()
+            hits = index.search(query.tolist(), k=k, **search_kwargs)
+            seconds.append(time.perf_counter() - started)
+            results.append([hit.position for hit in hits])
+        return results, seconds
+
+    def _row(self, label, recall, seconds):
+        stats = LatencyStats(len(seconds))
+        for value in seconds:
+            stats.record(value)
+        mean_ms = sum(seconds) / len(seconds) * 1000
+        p95_ms = stats.percentile(0.95) * 1000
+        return f"{label:<22} {recall:>9.3f} {mean_ms:>9.2f} {p95_ms:>9.2f}"
@@ -0,0 +1,116 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from qna_app.models import Document
+from qna_app.utils.storage import directory_size, discard_document, last_used, remove_store
+
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile CHROMA_PERSIST_DIRECTORY and media/documents/ with the Document table: "
+        "purge soft-deleted and abandoned documents, orphaned vector stores and orphaned uploads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=30,
+                            help="Leave deleted documents, orphaned stores and orphaned files younger than this alone, "
+                                 "so in-flight uploads and re-indexes survive. Stores swapped out by a re-index "
+                                 "are aged from the swap, so questions still reading them can finish.")
+        parser.add_argument('--unprocessed-grace-hours', type=int, default=24,
+                            help="Only treat a live document that was never processed as abandoned after this long. "
+                                 "Bulk uploads are processed inside the request and can run far longer than "
+                                 "--grace-minutes; their rows, files and partly written stores are kept until then.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be removed without removing it.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep running, collecting every INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            self.collect(options['grace_minutes'], options['unprocessed_grace_hours'], options['dry_run'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def collect(self, grace_minutes, unprocessed_grace_hours, dry_run):
+        cutoff = timezone.now() - timedelta(minutes=grace_minutes)
+        unprocessed_cutoff = timezone.now() - timedelta(hours=unprocessed_grace_hours)
+        cutoff_ts = cutoff.timestamp()
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        totals = {'documents': 0, 'stores': 0, 'files': 0, 'bytes': 0}
+
+        # Soft-deleted documents the background reclaimer missed, and uploads whose processing never finished.
+        stale = list(Document.objects.deleted().filter(deleted_at__lt=cutoff)) + list(
+            Document.objects.alive().filter(processed=False, created_at__lt=unprocessed_cutoff)
+        )
+        for document in stale:
+            size = self._document_size(document)
+            if not dry_run:
+                discard_document(document)
+            totals['documents'] += 1
+            totals['bytes'] += size
+
+        # Vector store directories no document points at.
+        referenced_stores = set(
+            Document.objects.exclude(vector_store_id__isnull=True).values_list('vector_store_id', flat=True)
+        )
+        # Stores still being written for documents that are not processed yet
+        referenced_stores.update(
+            f"doc_{document_id}" for document_id in Document.objects.filter(processed=False).values_list('id', flat=True)
+        )
+        persist_directory = settings.CHROMA_PERSIST_DIRECTORY
+        if os.path.isdir(persist_directory):
+            for entry in os.scandir(persist_directory):
+                if not entry.is_dir() or entry.name in referenced_stores:
+                    continue
+                # Stores retired by a re-index get the grace period from the swap, not from when they were built
+                if last_used(entry.name) > cutoff_ts:
+                    continue
+                size = directory_size(entry.path) if dry_run else remove_store(entry.name)
+                self.stdout.write(f"  orphaned store {entry.name}: {format_bytes(size)}")
+                totals['stores'] += 1
+                totals['bytes'] += size
+
+        # Uploaded files no document points at.
+        referenced_files = set(Document.objects.values_list('file', flat=True))
+        upload_directory = Document._meta.get_field('file').upload_to
+        if default_storage.exists(upload_directory):
+            _, files = default_storage.listdir(upload_directory)
+            for name in files:
+                path = os.path.join(upload_directory, name)
+                if path in referenced_files or default_storage.get_modified_time(path) > cutoff:
+                    continue
+                size = default_storage.size(path)
+                if not dry_run:
+                    default_storage.delete(path)
+                self.stdout.write(f"  orphaned file {path}: {format_bytes(size)}")
+                totals['files'] += 1
+                totals['bytes'] += size
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {format_bytes(totals['bytes'])}: {totals['documents']} documents, "
+            f"{totals['stores']} orphaned stores, {totals['files']} orphaned files"
+        ))
+        return totals
+
+    def _document_size(self, document) -> int:
+        size = 0
+        for vector_store_id in {document.vector_store_id, f"doc_{document.id}"} - {None}:
+            path = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, vector_store_id)
+            if os.path.isdir(path):
+                size += directory_size(path)
+        if document.file and default_storage.exists(document.file.name):
+            size += default_storage.size(document.file.name)
+        return size
@@ -0,0 +1,130 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Snippet run in a fresh interpreter so that the measurement reflects a real
+# cold start rather than whatever this process has already imported.
+PROBE = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+import django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+django.setup()
+import qna_project.urls
+missing = []
+for name in {extra!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        missing.append(name)
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss_kb //= 1024
+print(json.dumps({{'seconds': elapsed, 'max_rss_kb': rss_kb, 'modules': len(sys.modules), 'missing': missing}}))
+"""
+
+# Modules that the ingestion and Q&A paths load on first use.
+HEAVY_MODULES = [
+    'PyPDF2',
+    'docx',
+    'langchain.prompts',
+    'langchain_openai',
+    'chromadb',
+]
+
+
+class Command(BaseCommand):
+    help = "Report import time and memory of a cold start of the Django project."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25,
+                            help="Number of slowest modules to list.")
+        parser.add_argument('--compare', action='store_true',
+                            help="Also measure a start that eagerly imports the heavy ML/parsing modules.")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Cold starts measured per variant; the median is reported.")
+
+    def handle(self, *args, **options):
+        settings_module = settings.SETTINGS_MODULE
+        # -X importtime slows imports down, so times and memory come from uninstrumented runs
+        cold = self._measure(settings_module, [], options['repeat'])
+        breakdown = self._probe(settings_module, [], capture_importtime=True)
+
+        self.stdout.write(f"Cold start: {cold['seconds']:.3f}s, "
+                          f"max RSS {cold['max_rss_kb'] / 1024:.1f} MB, "
+                          f"{cold['modules']} modules (median of {options['repeat']})")
+        self.stdout.write(f"\nSlowest packages (self time under -X importtime, top {options['top']}):")
+        for self_us, name in breakdown['importtime'][:options['top']]:
+            self.stdout.write(f"  {self_us / 1000:9.1f} ms  {name}")
+
+        heavy_loaded = [name for name in HEAVY_MODULES if name in breakdown['loaded']]
+        if heavy_loaded:
+            self.stdout.write(self.style.WARNING(
+                f"\nHeavy modules imported at startup: {', '.join(heavy_loaded)}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("\nNo heavy ML/parsing modules imported at startup."))
+
+        if options['compare']:
+            eager = self._measure(settings_module, HEAVY_MODULES, options['repeat'])
+            if eager['missing']:
+                self.stdout.write(self.style.WARNING(
+                    f"\nNot installed, left out of the comparison: {', '.join(eager['missing'])}"
+                ))
+            self.stdout.write(
+                f"\nWith heavy modules: {eager['seconds']:.3f}s, "
+                f"max RSS {eager['max_rss_kb'] / 1024:.1f} MB, {eager['modules']} modules"
+            )
+            self.stdout.write(
+                f"Saved by lazy loading: {eager['seconds'] - cold['seconds']:.3f}s, "
+                f"{(eager['max_rss_kb'] - cold['max_rss_kb']) / 1024:.1f} MB"
+            )
+
+    def _measure(self, settings_module, extra, repeat):
+        """Median seconds and max RSS over `repeat` uninstrumented cold starts."""
+        runs = [self._probe(settings_module, extra) for _ in range(max(repeat, 1))]
+        result = dict(runs[0])
+        for key in ('seconds', 'max_rss_kb'):
+            result[key] = statistics.median(run[key] for run in runs)
+        return result
+
+    def _probe(self, settings_module, extra, capture_importtime=False):
+        code = PROBE.format(settings_module=settings_module, extra=extra)
+        if capture_importtime:
+            code += "print(json.dumps(sorted(sys.modules)))\n"
+        command = [sys.executable]
+        if capture_importtime:
+            command += ['-X', 'importtime']
+        command += ['-c', code]
+
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, check=True,
+                                       cwd=str(settings.BASE_DIR))
+        except subprocess.CalledProcessError as e:
+            errors = [line for line in e.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError(f"Cold start probe failed: {errors[-1] if errors else e}")
+        lines = completed.stdout.strip().splitlines()
+        result = json.loads(lines[0])
+        if capture_importtime:
+            result['loaded'] = set(json.loads(lines[1]))
+            result['importtime'] = self._parse_importtime(completed.stderr)
+        return result
+
+    def _parse_importtime(self, stderr):
+        """Sum `-X importtime` self times per top-level package, slowest first."""
+        totals = {}
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            try:
+                self_us, _, name = line[len('import time:'):].split('|')
+                package = name.strip().split('.')[0]
+                totals[package] = totals.get(package, 0) + int(self_us)
+            except ValueError:
+                continue
+        return sorted(((us, package) for package, us in totals.items()), reverse=True)
@@ -0,0 +1,164 @@
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from qna_app.models import Document
+from qna_app.utils.document_processor import DocumentProcessor
+from qna_app.utils.storage import mark_retired, remove_store
+
+
+class Checkpoint:
+    """Progress of a re-index run, persisted after every document so a run can resume."""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {'done': [], 'failed': {}}
+        if not restart and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self.state = json.load(checkpoint_file)
+        self.done = set(self.state['done'])
+
+    def mark(self, document_id: str, error: str = None):
+        with self.lock:
+            if error is None:
+                self.done.add(document_id)
+                self.state['done'] = sorted(self.done)
+                self.state['failed'].pop(document_id, None)
+            else:
+                self.state['failed'][document_id] = error
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, 'w') as checkpoint_file:
+                json.dump(self.state, checkpoint_file)
+            os.replace(temporary_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RateLimiter:
+    """Spaces out document starts so that at most `per_minute` begin each minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self.lock = threading.Lock()
+        self.next_start = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        time.sleep(max(0, start - now))
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the vector stores of existing documents with the current chunking, embedding and storage "
+        "settings. New stores are built next to the old ones and swapped in atomically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('document_ids', nargs='*', help="Only re-index these documents.")
+        parser.add_argument('--user', help="Only re-index documents owned by this username.")
+        parser.add_argument('--file-type', help="Only re-index documents of this file type (txt, pdf, docx).")
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--rate', type=float, default=30,
+                            help="Maximum documents started per minute (0 for unlimited).")
+        parser.add_argument('--nice', type=int, default=10,
+                            help="Lower this process's CPU priority so live traffic keeps precedence.")
+        parser.add_argument('--checkpoint', default=os.path.join(settings.CHROMA_PERSIST_DIRECTORY,
+                                                                 '.reindex-checkpoint.json'))
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore the checkpoint left by an interrupted or partly failed run.")
+        parser.add_argument('--dry-run', action='store_true', help="List the documents that would be re-indexed.")
+
+    def handle(self, *args, **options):
+        queryset = Document.objects.alive().filter(processed=True).order_by('created_at')
+        if options['document_ids']:
+            queryset = queryset.filter(id__in=options['document_ids'])
+        if options['user']:
+            queryset = queryset.filter(user__username=options['user'])
+        if options['file_type']:
+            queryset = queryset.filter(file_type=options['file_type'].lower())
+
+        os.makedirs(os.path.dirname(options['checkpoint']) or '.', exist_ok=True)
+        checkpoint = Checkpoint(options['checkpoint'], restart=options['restart'])
+        pending = [str(document_id) for document_id in queryset.values_list('id', flat=True)
+                   if str(document_id) not in checkpoint.done]
+        self.stdout.write(f"{len(pending)} documents to re-index ({len(checkpoint.done)} already done)")
+        if options['dry_run'] or not pending:
+            return
+
+        if options['nice'] and hasattr(os, 'nice'):
+            os.nice(options['nice'])
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        limiter = RateLimiter(options['rate'])
+        processor = DocumentProcessor()
+        retired = []
+        failures = 0
+
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='reindex') as pool:
+            futures = {
+                pool.submit(self.reindex_document, processor, limiter, document_id): document_id
+                for document_id in pending
+            }
+            for completed, future in enumerate(as_completed(futures), start=1):
+                document_id = futures[future]
+                try:
+                    old_store_id = future.result()
+                    checkpoint.mark(document_id)
+                    if old_store_id:
+                        retired.append(old_store_id)
+                    self.stdout.write(f"[{completed}/{len(pending)}] {document_id} re-indexed")
+                except Exception as e:
+                    failures += 1
+                    checkpoint.mark(document_id, error=str(e))
+                    self.stderr.write(f"[{completed}/{len(pending)}] {document_id} failed: {e}")
+
+        # Old stores are only removed once the whole run is over, so questions already
+        # reading them finish; anything left behind by a crash is picked up by gc_storage.
+        for vector_store_id in retired:
+            remove_store(vector_store_id)
+
+        # A clean run needs no resuming; keep the checkpoint only to retry failures.
+        if not failures:
+            checkpoint.clear()
+
+        message = f"Re-indexed {len(pending) - failures} documents, {failures} failed"
+        self.stdout.write(self.style.WARNING(message) if failures else self.style.SUCCESS(message))
+
+    def reindex_document(self, processor, limiter, document_id):
+        """Build a fresh store for one document and swap it in; returns the retired store id."""
+        limiter.wait()
+        try:
+            document = Document.objects.alive().get(id=document_id)
+            old_store_id = document.vector_store_id
+            new_store_id = f"doc_{document.id}_r{secrets.token_hex(4)}"
+            processor.build_vector_store(document, new_store_id)
+
+            # Marked before the swap, so gc_storage never sees the old store unreferenced and unmarked
+            if old_store_id:
+                mark_retired(old_store_id)
+            # Compare-and-swap: skip if the document was deleted or re-indexed meanwhile.
+            swapped = Document.objects.alive().filter(
+                id=document.id, vector_store_id=old_store_id
+            ).update(vector_store_id=new_store_id)
+            if not swapped:
+                remove_store(new_store_id)
+                raise RuntimeError("document changed during re-index")
+            return old_store_id
+        finally:
+            connection.close()
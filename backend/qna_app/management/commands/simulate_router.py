@@ -0,0 +1,96 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from qna_app.utils.model_router import DeadlineExceeded, FakeModel, LatencyStats, ModelRouter
+
+QUESTIONS = [
+    "What is the notice period?",
+    "Who signed the agreement?",
+    "When does the contract expire?",
+    "How many employees are covered?",
+    "Summarise the obligations of each party and explain how they interact with the termination clauses.",
+    "Compare the risk sections of the report and explain which mitigation strategies the authors recommend.",
+]
+
+
+class Command(BaseCommand):
+    help = "Exercise the LLM model router against local fake models and report routing, hedging and tail latency."
+
+    def add_arguments(self, parser):
+        config = settings.LLM_ROUTING
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--fast-latency', type=float, default=0.2)
+        parser.add_argument('--large-latency', type=float, default=1.0)
+        parser.add_argument('--tail-probability', type=float, default=0.05,
+                            help="Probability that a call hits the slow tail.")
+        parser.add_argument('--tail-latency', type=float, default=4.0)
+        parser.add_argument('--failure-rate', type=float, default=0.0)
+        parser.add_argument('--deadline', type=float, default=config['DEADLINE_SECONDS'])
+        parser.add_argument('--no-hedge', action='store_true')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        fake = dict(
+            tail_probability=options['tail_probability'],
+            tail_latency=options['tail_latency'],
+            failure_rate=options['failure_rate'],
+        )
+        router = ModelRouter(
+            {
+                'fast': FakeModel('fast', latency=options['fast_latency'],
+                                  jitter=options['fast_latency'] / 4, seed=options['seed'], **fake),
+                'large': FakeModel('large', latency=options['large_latency'],
+                                   jitter=options['large_latency'] / 4, seed=options['seed'] + 1, **fake),
+            },
+            deadline=options['deadline'],
+            hedge=not options['no_hedge'],
+            hedge_min_samples=settings.LLM_ROUTING['HEDGE_MIN_SAMPLES'],
+            cooldown=settings.LLM_ROUTING['COOLDOWN_SECONDS'],
+            max_workers=options['concurrency'] * 2,
+        )
+        rng = random.Random(options['seed'])
+        workload = [
+            (rng.choice(QUESTIONS), "x" * rng.choice([800, 2500, 4000, 8000]))
+            for _ in range(options['requests'])
+        ]
+
+        def ask(item):
+            question, context = item
+            started = time.monotonic()
+            try:
+                _, model = router.complete(question, question=question, context=context)
+                outcome = model
+            except DeadlineExceeded:
+                outcome = 'deadline exceeded'
+            except Exception:
+                outcome = 'failed'
+            return outcome, time.monotonic() - started
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(ask, workload))
+
+        outcomes = Counter(outcome for outcome, _ in results)
+        latencies = LatencyStats(max(len(results), 1))
+        for _, seconds in results:
+            latencies.record(seconds)
+        self.stdout.write(f"{len(results)} requests, deadline {options['deadline']}s, "
+                          f"hedging {'off' if options['no_hedge'] else 'on'}")
+        for outcome, count in outcomes.most_common():
+            self.stdout.write(f"  {outcome:<18} {count:>6}")
+        self.stdout.write(
+            f"latency p50 {latencies.percentile(0.5):.3f}s  p95 {latencies.percentile(0.95):.3f}s  "
+            f"p99 {latencies.percentile(0.99):.3f}s  max {latencies.percentile(1.0):.3f}s"
+        )
+        snapshot = router.snapshot()
+        self.stdout.write(f"hedges sent {snapshot['hedges']}, won {snapshot['hedge_wins']}; "
+                          f"deadline misses {snapshot['deadline_misses']}, queued calls cancelled "
+                          f"{snapshot['cancelled']}; queue wait {snapshot['queue_wait']}")
+        for name, stats in snapshot['models'].items():
+            self.stdout.write(f"  {name}: {stats}")
+        router.executor.shutdown(wait=False)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+
+class LargeResponseGZipMiddleware(GZipMiddleware):
+    """Gzip only responses of at least GZIP_MIN_SIZE bytes.
+
+    Small JSON bodies gain little from compression and cost CPU on every
+    request; large list pages and answers shrink several times over.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.GZIP_MIN_SIZE:
+            return response
+        return super().process_response(request, response)
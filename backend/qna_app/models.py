@@ -6,6 +6,13 @@ from django.utils import timezone
 
 # Create your models here.
 
+class DocumentQuerySet(models.QuerySet):
+    def alive(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def deleted(self):
+        return self.filter(deleted_at__isnull=False)
+
 class Document(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
@@ -17,6 +24,10 @@ class Document(models.Model):
     vector_store_id = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set on delete; the row, vector store and file are reclaimed in the background
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = DocumentQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
@@ -1,7 +1,28 @@
+import zipfile
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Document, QASession
 
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+ALLOWED_EXTENSIONS = ['.txt', '.pdf', '.docx']
+
+
+def validate_upload(name, size):
+    """Check an uploaded file's size and extension."""
+    # Check file size (50MB max)
+    if size > MAX_UPLOAD_SIZE:
+        raise serializers.ValidationError("File size cannot exceed 50MB")
+    
+    # Check file extension
+    file_extension = '.' + name.split('.')[-1].lower()
+    
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise serializers.ValidationError(
+            f"File type not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     password_confirm = serializers.CharField(write_only=True)
@@ -31,26 +52,62 @@ class DocumentUploadSerializer(serializers.ModelSerializer):
         fields = ('file', 'title')
 
     def validate_file(self, value):
-        # Check file size (50MB max)
-        if value.size > 50 * 1024 * 1024:
-            raise serializers.ValidationError("File size cannot exceed 50MB")
+        validate_upload(value.name, value.size)
+        return value
+
+class BulkDocumentUploadSerializer(serializers.Serializer):
+    files = serializers.ListField(child=serializers.FileField(), required=False)
+    archive = serializers.FileField(required=False, help_text="ZIP archive of .txt, .pdf and .docx files")
+
+    def validate_archive(self, value):
+        if not zipfile.is_zipfile(value):
+            raise serializers.ValidationError("Archive must be a ZIP file")
+        value.seek(0)
+        return value
+
+    def validate(self, data):
+        if not data.get('files') and not data.get('archive'):
+            raise serializers.ValidationError("Provide files or a ZIP archive")
         
-        # Check file extension
-        allowed_extensions = ['.txt', '.pdf', '.docx']
-        file_extension = '.' + value.name.split('.')[-1].lower()
+        # Sizes declared in the ZIP directory are enforced by zipfile when entries are read,
+        # so the limits hold without decompressing anything here
+        total_size = sum(uploaded_file.size for uploaded_file in data.get('files', []))
+        archive = data.get('archive')
+        if archive:
+            with zipfile.ZipFile(archive) as zip_file:
+                for info in zip_file.infolist():
+                    if info.is_dir():
+                        continue
+                    if info.file_size > settings.BULK_UPLOAD_MAX_COMPRESSION_RATIO * max(info.compress_size, 1):
+                        raise serializers.ValidationError(
+                            f"Archive entry {info.filename} is compressed suspiciously well"
+                        )
+                    total_size += info.file_size
+            archive.seek(0)
         
-        if file_extension not in allowed_extensions:
+        if total_size > settings.BULK_UPLOAD_MAX_TOTAL_SIZE:
             raise serializers.ValidationError(
-                f"File type not supported. Allowed types: {', '.join(allowed_extensions)}"
+                f"Upload expands to {filesizeformat(total_size)}, more than the "
+                f"{filesizeformat(settings.BULK_UPLOAD_MAX_TOTAL_SIZE)} allowed per request"
             )
-        
-        return value
+        return data
 
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = ('id', 'title', 'file_type', 'file_size', 'processed', 'created_at', 'updated_at')
 
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=settings.SEARCH_MIN_QUERY_LENGTH, max_length=1000)
+    k = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+class SearchHitSerializer(serializers.Serializer):
+    text = serializers.CharField()
+    score = serializers.FloatField()
+    page = serializers.IntegerField(allow_null=True)
+    start = serializers.IntegerField(allow_null=True)
+    end = serializers.IntegerField(allow_null=True)
+
 class QARequestSerializer(serializers.Serializer):
     document_id = serializers.UUIDField()
     question = serializers.CharField(max_length=1000)
@@ -1,3 +1,608 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import user_cache
+from .management.commands import benchmark_serialization
+from .models import Document, QASession
+from .utils import document_processor
+from .utils.admission import AdmissionController, admission
+from .utils.model_router import FakeModel, ModelRouter
+from .utils.singleflight import SingleFlight
+from .utils.storage import mark_retired
+from .utils.text_chunker import Chunk
+from .utils.vector_index import VectorIndex, compact_search, dequantize, quantize, store_path
+from . import views
+from .views import DocumentListView, QAHistoryView
+
+QUESTION = "What is the notice period?"
+
+
+class ModelRouterTests(SimpleTestCase):
+    def make_router(self, fast, large, **kwargs):
+        options = dict(deadline=1.0, hedge=False, hedge_min_samples=5, cooldown=0.1)
+        options.update(kwargs)
+        return ModelRouter({'fast': fast, 'large': large}, **options)
+
+    def ask(self, router):
+        try:
+            return router.complete(QUESTION, question=QUESTION, context="")[1]
+        except Exception:
+            return 'failed'
+
+    def test_single_failure_does_not_route_around_model(self):
+        fast = FakeModel('fast', latency=0, jitter=0, failure_rate=1.0)
+        router = self.make_router(fast, FakeModel('large', latency=0, jitter=0))
+        self.assertEqual(self.ask(router), 'failed')
+
+        fast.failure_rate = 0.0
+        self.assertEqual({self.ask(router) for _ in range(20)}, {'fast'})
+
+    def test_failing_model_is_routed_around_and_recovers(self):
+        fast = FakeModel('fast', latency=0, jitter=0, failure_rate=1.0)
+        router = self.make_router(fast, FakeModel('large', latency=0, jitter=0))
+        for _ in range(5):
+            self.assertEqual(self.ask(router), 'failed')
+        self.assertEqual({self.ask(router) for _ in range(10)}, {'large'})
+
+        # Still failing when the first probe comes round: stays routed around
+        time.sleep(0.15)
+        self.assertEqual(self.ask(router), 'failed')
+        self.assertEqual(self.ask(router), 'large')
+
+        fast.failure_rate = 0.0
+        time.sleep(0.15)
+        self.assertEqual(self.ask(router), 'fast')
+        self.assertEqual({self.ask(router) for _ in range(10)}, {'fast'})
+        self.assertEqual(router.snapshot()['routed_around'], [])
+
+    def test_timeouts_count_towards_slowness(self):
+        fast = FakeModel('fast', latency=0.2, jitter=0)
+        router = self.make_router(fast, FakeModel('large', latency=0, jitter=0), deadline=0.05)
+        for _ in range(5):
+            self.assertEqual(self.ask(router), 'failed')
+        time.sleep(0.25)  # let the abandoned calls finish and be recorded
+        self.assertEqual(router.choose(QUESTION, ""), 'large')
+
+    def test_queued_calls_share_the_deadline_and_are_cancelled(self):
+        fast = FakeModel('fast', latency=0.3, jitter=0)
+        router = self.make_router(fast, FakeModel('large', latency=0, jitter=0), deadline=0.5, max_workers=2)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            outcomes = list(pool.map(lambda _: self.ask(router), range(8)))
+        time.sleep(0.1)
+
+        snapshot = router.snapshot()
+        self.assertEqual(outcomes.count('fast'), 2)
+        self.assertEqual(snapshot['deadline_misses'], 6)
+        # Calls that only got a worker after their deadline never reached the model
+        self.assertEqual(fast.calls + snapshot['cancelled'], 8)
+        self.assertGreater(snapshot['queue_wait']['p95'], 0.2)
+        self.assertEqual(snapshot['in_flight'], 0)
+
+    def test_calls_still_queued_at_the_deadline_are_cancelled(self):
+        calls = []
+
+        def stuck(prompt, timeout):
+            calls.append(timeout)
+            time.sleep(0.5)  # ignores its timeout, keeping both workers busy past the deadline
+            return "late"
+
+        router = self.make_router(stuck, FakeModel('large', latency=0, jitter=0), deadline=0.2, max_workers=2)
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            outcomes = list(pool.map(lambda _: self.ask(router), range(6)))
+
+        self.assertEqual(outcomes, ['failed'] * 6)
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(timeout <= 0.2 for timeout in calls))
+        self.assertEqual(router.snapshot()['cancelled'], 4)
+
+
+@override_settings(BULK_UPLOAD_MAX_TOTAL_SIZE=1000)
+class BulkUploadLimitTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('uploader', password='secret-password'))
+
+    def test_oversized_body_is_refused_before_parsing(self):
+        files = [SimpleUploadedFile(f'{i}.txt', b'x' * 600) for i in range(2)]
+        response = self.client.post('/api/documents/bulk-upload/', {'files': files}, format='multipart')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Document.objects.exists())
+
+
+def unit_vectors(count, dimensions=32, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class QuantizationTests(SimpleTestCase):
+    def test_quantize_round_trips_within_one_step(self):
+        vectors = unit_vectors(50)
+        vectors[0] = 0
+        compact, scales = quantize(vectors, 'int8')
+        self.assertEqual(compact.dtype, np.int8)
+        self.assertEqual(np.abs(compact[1:]).max(axis=1).min(), 127)
+        self.assertEqual(scales[0], 1.0)
+        error = np.abs(dequantize(compact, scales) - vectors).max(axis=1)
+        self.assertTrue((error <= scales / 2 + 1e-6).all())
+
+        compact, scales = quantize(vectors, 'float16')
+        self.assertEqual(compact.dtype, np.float16)
+        self.assertIsNone(scales)
+        with self.assertRaises(ValueError):
+            quantize(vectors, 'int4')
+
+    def test_compact_search_ranks_like_exact_search(self):
+        vectors = unit_vectors(200)
+        query = vectors[7] + 0.1 * unit_vectors(1, seed=1)[0]
+        exact = np.argsort(-(vectors @ query))[:5].tolist()
+        compact, scales = quantize(vectors, 'int8')
+
+        single_pass = compact_search(query, compact, scales, None, 5, candidates=40)
+        self.assertEqual(single_pass[0][0], 7)
+        self.assertEqual(len(single_pass), 5)
+        self.assertEqual([score for _, score in single_pass], sorted((s for _, s in single_pass), reverse=True))
+
+        rescored = compact_search(query, compact, scales, vectors, 5, candidates=40)
+        self.assertEqual([row for row, _ in rescored], exact)
+        self.assertAlmostEqual(rescored[0][1], float(vectors[exact[0]] @ query), places=5)
+
+    def test_compact_search_only_scans_given_ranges(self):
+        vectors = unit_vectors(100)
+        compact, scales = quantize(vectors, 'float16')
+        ranked = compact_search(vectors[5], compact, scales, None, 3, candidates=3, ranges=[(40, 60)])
+        self.assertTrue(all(40 <= row < 60 for row, _ in ranked))
+        self.assertEqual(len(compact_search(vectors[5], compact, scales, None, 50, 50, ranges=[(0, 4)])), 4)
+
+
+class VectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.vectors = unit_vectors(60)
+        self.chunks = [Chunk(text=f"chunk {i}", page=i // 10 + 1, start=i * 100, end=i * 100 + 90)
+                       for i in range(60)]
+
+    def build(self, store_id, **kwargs):
+        with self.settings(CHROMA_PERSIST_DIRECTORY=self.directory):
+            return VectorIndex.build(store_id, self.chunks, self.vectors, **kwargs)
+
+    def test_compact_store_round_trip(self):
+        for storage, full_precision in [('int8', False), ('float16', False), ('int8', True)]:
+            with self.subTest(storage=storage, full_precision=full_precision):
+                index = self.build(f'doc_{storage}_{full_precision}', storage=storage, section_size=0,
+                                   full_precision=full_precision)
+                self.assertEqual(index.manifest['chunks'], 60)
+                self.assertEqual(index.has_full_precision, full_precision)
+
+                hits = index.search(self.vectors[12], k=3)
+                self.assertEqual(hits[0].position, 12)
+                self.assertEqual(hits[0].text, "chunk 12")
+                self.assertEqual(hits[0].metadata, {'page': 2, 'start': 1200, 'end': 1290})
+                self.assertAlmostEqual(hits[0].score, 1.0, places=2)
+                self.assertEqual(index.get_chunks([12])[0], self.chunks[12])
+
+    def test_hierarchical_search_stays_in_the_closest_sections(self):
+        # Each run of ten chunks lies close to its own topic direction
+        topics = np.repeat(unit_vectors(6, seed=2), 10, axis=0)
+        self.vectors = unit_vectors(60) * 0.3 + topics
+        self.vectors /= np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        index = self.build('doc_sections', storage='int8', section_size=10, full_precision=False)
+        self.assertEqual(index.manifest['sections'], 6)
+        self.assertTrue(index.hierarchical)
+        hits = index.search(self.vectors[33], k=3, top_sections=1)
+        self.assertEqual(hits[0].position, 33)
+        self.assertTrue(all(30 <= hit.position < 40 for hit in hits))
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.stamp_path = os.path.join(directory, 'auth_cache.stamp')
+        cache_settings = self.settings(AUTH_USER_CACHE={'TTL_SECONDS': 60, 'MAX_SIZE': 100,
+                                                        'STAMP_PATH': self.stamp_path})
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        self.addCleanup(user_cache.invalidate)
+        user_cache.invalidate()
+
+        self.user = User.objects.create_user('reader', password='secret-password')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.assertEqual(self.client.get('/api/documents/').status_code, 200)
+
+    def save(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(**kwargs)
+
+    def test_cached_user_is_not_queried_again(self):
+        with self.assertNumQueries(1):  # document count
+            self.assertEqual(self.client.get('/api/documents/').status_code, 200)
+
+    def test_deactivated_user_is_refused_on_the_next_request(self):
+        self.user.is_active = False
+        self.save()
+        self.assertEqual(self.client.get('/api/documents/').status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        self.user.set_password('another-password')
+        self.save()
+        response = self.client.get('/api/documents/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'password_changed')
+
+    def test_last_login_update_keeps_the_cache(self):
+        stamp = os.path.getsize(self.stamp_path)
+        self.save(update_fields=['last_login'])
+        self.assertEqual(os.path.getsize(self.stamp_path), stamp)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/documents/').status_code, 200)
+
+    def test_stamp_bump_from_another_process_clears_the_cache(self):
+        with open(self.stamp_path, 'ab') as stamp_file:
+            stamp_file.write(b'.')
+        with self.assertNumQueries(2):  # user and document count
+            self.assertEqual(self.client.get('/api/documents/').status_code, 200)
+
+    def test_callers_get_their_own_copy(self):
+        first, _ = user_cache.get_or_load(str(self.user.pk), lambda: None)
+        first.is_active = False
+        second, cached = user_cache.get_or_load(str(self.user.pk), lambda: None)
+        self.assertTrue(cached)
+        self.assertTrue(second.is_active)
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.db_path = os.path.join(directory, 'admission.sqlite3')
+        self.controller = AdmissionController()
+
+    def configure(self, lease=60, **limits):
+        pool = dict(PER_USER=0, GLOBAL=0, QUEUE=0, MAX_WAIT=0, RETRY_AFTER=7)
+        pool.update(limits)
+        admission_settings = self.settings(ADMISSION_CONTROL={
+            'DB_PATH': self.db_path, 'LEASE_SECONDS': lease, 'POOLS': {'qa': pool},
+        })
+        admission_settings.enable()
+        self.addCleanup(admission_settings.disable)
+
+    def hold(self, user_id, release, admitted=None):
+        """Start a thread that takes a slot and keeps it until `release` is set."""
+        def run():
+            try:
+                with self.controller.admit('qa', user_id):
+                    if admitted is not None:
+                        admitted.append(user_id)
+                    release.wait()
+            except Throttled:
+                if admitted is not None:
+                    admitted.append(f'{user_id} rejected')
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        return thread
+
+    def assertRejected(self, user_id):
+        with self.assertRaises(Throttled) as raised:
+            with self.controller.admit('qa', user_id):
+                pass
+        self.assertEqual(raised.exception.wait, 7)
+
+    def test_per_user_limit(self):
+        self.configure(PER_USER=1)
+        with self.controller.admit('qa', 1):
+            self.assertRejected(1)
+            with self.controller.admit('qa', 2):
+                pass
+        with self.controller.admit('qa', 1):
+            pass
+
+    def test_global_limit(self):
+        self.configure(GLOBAL=2)
+        with self.controller.admit('qa', 1), self.controller.admit('qa', 2):
+            self.assertRejected(3)
+        with self.controller.admit('qa', 3):
+            pass
+
+    def test_full_queue_is_rejected_without_waiting(self):
+        self.configure(GLOBAL=1, QUEUE=1, MAX_WAIT=5)
+        release = threading.Event()
+        with self.controller.admit('qa', 1):
+            self.hold(2, release)
+            time.sleep(0.2)  # user 2 is queued
+            started = time.monotonic()
+            self.assertRejected(3)
+            self.assertLess(time.monotonic() - started, 1)
+            release.set()
+
+    def test_waiters_are_admitted_in_arrival_order(self):
+        self.configure(GLOBAL=1, QUEUE=4, MAX_WAIT=5)
+        release = threading.Event()
+        admitted = []
+        threads = []
+        with self.controller.admit('qa', 1):
+            for user_id in (2, 3, 4):
+                threads.append(self.hold(user_id, release, admitted))
+                time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(admitted, [2, 3, 4])
+
+    def test_waiter_blocked_by_its_own_user_limit_does_not_hold_up_others(self):
+        self.configure(PER_USER=1, GLOBAL=2, QUEUE=4, MAX_WAIT=1)
+        release = threading.Event()
+        admitted = []
+        with self.controller.admit('qa', 1):
+            self.hold(1, release, admitted)
+            time.sleep(0.1)
+            started = time.monotonic()
+            with self.controller.admit('qa', 2):
+                self.assertLess(time.monotonic() - started, 0.5)
+            release.set()
+
+    def test_lease_is_renewed_while_the_slot_is_held(self):
+        self.configure(lease=0.3, GLOBAL=1)
+        with self.controller.admit('qa', 1):
+            time.sleep(0.8)
+            self.assertRejected(2)
+
+
+class AdmissionResponseTests(TestCase):
+    def test_saturated_pool_answers_429_with_retry_after(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        admission_settings = self.settings(ADMISSION_CONTROL={
+            'DB_PATH': os.path.join(directory, 'admission.sqlite3'),
+            'LEASE_SECONDS': 60,
+            'POOLS': {'qa': {'PER_USER': 1, 'GLOBAL': 0, 'QUEUE': 0, 'MAX_WAIT': 0, 'RETRY_AFTER': 5}},
+        })
+        admission_settings.enable()
+        self.addCleanup(admission_settings.disable)
+
+        user = User.objects.create_user('asker', password='secret-password')
+        document = Document.objects.create(user=user, title='Report', file='documents/report.txt',
+                                           file_type='txt', file_size=10, processed=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        with admission.admit('qa', user.id):
+            response = client.post('/api/qa/ask/', {'document_id': str(document.id), 'question': QUESTION},
+                                   format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+class StubEmbeddings:
+    """Stands in for OpenAIEmbeddings; embeds "chunk N" as the vector of chunk N."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.vectors[int(text.split()[-1])].tolist()
+
+
+class DocumentSearchTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store_settings = self.settings(CHROMA_PERSIST_DIRECTORY=directory)
+        store_settings.enable()
+        self.addCleanup(store_settings.disable)
+
+        vectors = unit_vectors(40)
+        chunks = [Chunk(text=f"chunk {i}", page=1, start=i * 10, end=i * 10 + 8) for i in range(40)]
+        VectorIndex.build('doc_search', chunks, vectors, section_size=0, storage='int8', full_precision=False)
+
+        self.embeddings = StubEmbeddings(vectors)
+        previous = document_processor._embeddings
+        document_processor._embeddings = self.embeddings
+        self.addCleanup(setattr, document_processor, '_embeddings', previous)
+        document_processor._query_embeddings.clear()
+        self.addCleanup(document_processor._query_embeddings.clear)
+
+        user = User.objects.create_user('searcher', password='secret-password')
+        self.document = Document.objects.create(user=user, title='Report', file='documents/report.txt',
+                                                file_type='txt', file_size=10, processed=True,
+                                                vector_store_id='doc_search')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def search(self, query, k=3):
+        return self.client.get(f'/api/documents/{self.document.id}/search/', {'q': query, 'k': k})
+
+    def test_search_returns_ranked_chunks_with_separate_timings(self):
+        response = self.search('find chunk 17')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['results'][0]['text'], 'chunk 17')
+        self.assertEqual(response.data['results'][0]['start'], 170)
+        self.assertGreaterEqual(response.data['embedding_ms'], 0)
+        self.assertGreaterEqual(response.data['ranking_ms'], 0)
+
+        self.search('find chunk 17')
+        self.assertEqual(self.embeddings.calls, 1)
+
+    def test_short_queries_are_refused_without_embedding(self):
+        response = self.search('c')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('q', response.data)
+        self.assertEqual(self.embeddings.calls, 0)
+
+
+class GarbageCollectionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        storage_settings = self.settings(CHROMA_PERSIST_DIRECTORY=os.path.join(directory, 'chroma'),
+                                         MEDIA_ROOT=os.path.join(directory, 'media'))
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+    def old_store(self, vector_store_id):
+        path = store_path(vector_store_id)
+        os.makedirs(path)
+        with open(os.path.join(path, 'vectors.npy'), 'wb') as vectors_file:
+            vectors_file.write(b'x' * 100)
+        hour_ago = time.time() - 3600
+        os.utime(os.path.join(path, 'vectors.npy'), (hour_ago, hour_ago))
+        os.utime(path, (hour_ago, hour_ago))
+        return path
+
+    def test_retired_store_is_kept_until_the_grace_period_after_the_swap(self):
+        orphan = self.old_store('doc_orphan')
+        retired = self.old_store('doc_retired')
+        mark_retired('doc_retired')
+        hour_ago = time.time() - 3600
+        os.utime(retired, (hour_ago, hour_ago))  # only the marker says when it was retired
+
+        call_command('gc_storage', grace_minutes=30, stdout=io.StringIO())
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(retired))
+
+
+class ListPayloadTests(TestCase):
+    def test_values_and_orjson_match_serializers_and_json_renderer(self):
+        user = benchmark_serialization.Command().create_fixtures(30)
+        # Nullable fields must come out the same way too
+        QASession.objects.filter(pk__in=list(QASession.objects.values_list('pk', flat=True)[::3])).update(
+            confidence_score=None)
+        factory = APIRequestFactory()
+        for view_class in (DocumentListView, QAHistoryView):
+            payloads = []
+            for _, view in benchmark_serialization.variants(view_class, page_size=20):
+                request = factory.get('/', {'page': 2})
+                force_authenticate(request, user=user)
+                response = view(request).render()
+                self.assertEqual(response.status_code, 200)
+                payloads.append(json.loads(response.content))
+            with self.subTest(view=view_class.__name__):
+                baseline, fast = payloads
+                self.assertEqual(len(baseline['results']), 10)
+                self.assertEqual(fast, baseline)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_duplicates_run_once_and_share_the_result(self):
+        flight = SingleFlight('test')
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return {'answer': 42}
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(flight.do, 'key', fn) for _ in range(4)]
+            wait_until(lambda: flight.stats()['coalesced'] == 3)
+            release.set()
+            outcomes = [future.result() for future in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in outcomes), [False, True, True, True])
+        self.assertTrue(all(result == {'answer': 42} for result, _ in outcomes))
+        self.assertEqual(flight.stats(), {'executed': 1, 'coalesced': 3, 'in_flight': 0})
+
+        # Nothing is cached once the call is over
+        self.assertEqual(flight.do('key', lambda: 'again'), ('again', False))
+
+    def test_callers_share_the_leaders_exception(self):
+        flight = SingleFlight('test')
+        release = threading.Event()
+        error = RuntimeError("model unavailable")
+
+        def fn():
+            release.wait(5)
+            raise error
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(flight.do, 'key', fn) for _ in range(4)]
+            wait_until(lambda: flight.stats()['coalesced'] == 3)
+            release.set()
+            raised = [future.exception() for future in futures]
+
+        self.assertTrue(all(exception is error for exception in raised))
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+
+class BlockingAIServices:
+    release = threading.Event()
+    calls = 0
+
+    def answer_question(self, document, question):
+        BlockingAIServices.calls += 1
+        self.release.wait(5)
+        return {'answer': "Ninety days.", 'confidence_score': 0.9, 'response_time': 0.5}
+
+
+class CoalescedQuestionTests(TransactionTestCase):
+    def test_each_caller_of_a_shared_answer_gets_its_own_session(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        admission_settings = self.settings(ADMISSION_CONTROL={
+            'DB_PATH': os.path.join(directory, 'admission.sqlite3'), 'LEASE_SECONDS': 60, 'POOLS': {},
+        })
+        admission_settings.enable()
+        self.addCleanup(admission_settings.disable)
+        original = views.AIServices
+        views.AIServices = BlockingAIServices
+        self.addCleanup(setattr, views, 'AIServices', original)
+        BlockingAIServices.release.clear()
+        BlockingAIServices.calls = 0
+
+        user = User.objects.create_user('asker', password='secret-password')
+        document = Document.objects.create(user=user, title='Report', file='documents/report.txt',
+                                           file_type='txt', file_size=10, processed=True)
+
+        def ask(_):
+            try:
+                client = APIClient()
+                client.force_authenticate(user)
+                return client.post('/api/qa/ask/', {'document_id': str(document.id), 'question': QUESTION},
+                                   format='json')
+            finally:
+                connection.close()
+
+        coalesced = views.question_flight.stats()['coalesced']
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(ask, i) for i in range(3)]
+            wait_until(lambda: views.question_flight.stats()['coalesced'] == coalesced + 2)
+            BlockingAIServices.release.set()
+            responses = [future.result() for future in futures]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertEqual(BlockingAIServices.calls, 1)
+        self.assertEqual(len({response.data['id'] for response in responses}), 3)
+        self.assertEqual(QASession.objects.filter(user=user, answer="Ninety days.").count(), 3)
@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
-    RegisterView, LoginView, DocumentUploadView, DocumentListView, 
-    DocumentDeleteView, QAView, QAHistoryView, health_check
+    RegisterView, LoginView, DocumentUploadView, BulkDocumentUploadView, DocumentListView, 
+    DocumentDeleteView, DocumentSearchView, QAView, QAHistoryView, health_check
 )
 
 urlpatterns = [
@@ -14,8 +14,10 @@ urlpatterns = [
     
     # Documents
     path('documents/upload/', DocumentUploadView.as_view(), name='document_upload'),
+    path('documents/bulk-upload/', BulkDocumentUploadView.as_view(), name='document_bulk_upload'),
     path('documents/', DocumentListView.as_view(), name='document_list'),
     path('documents/<uuid:document_id>/', DocumentDeleteView.as_view(), name='document_delete'),
+    path('documents/<uuid:document_id>/search/', DocumentSearchView.as_view(), name='document_search'),
     
     # Q&A
     path('qa/ask/', QAView.as_view(), name='qa_ask'),
@@ -0,0 +1,184 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS admission_slots (
+    token TEXT PRIMARY KEY,
+    pool TEXT NOT NULL,
+    user_id INTEGER,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS admission_slots_pool ON admission_slots (pool, state, user_id);
+"""
+
+# Waiting requests queued before this one (by created_at) that could take a slot now; they
+# go first. Waiters held back by their own per-user limit don't block anyone else.
+WAITERS_AHEAD = """
+SELECT COUNT(*), COALESCE(SUM(waiting.user_id = :user_id), 0) FROM admission_slots AS waiting
+WHERE waiting.pool = :pool AND waiting.state = 'waiting'
+  AND (waiting.created_at, waiting.token) < (:created_at, :token)
+  AND (:per_user = 0 OR (
+    SELECT COUNT(*) FROM admission_slots AS active
+    WHERE active.pool = :pool AND active.state = 'active' AND active.user_id = waiting.user_id
+  ) < :per_user)
+"""
+
+POLL_INTERVAL = 0.05
+
+
+class AdmissionController:
+    """Per-user and global concurrency limits shared by every worker process on a host.
+
+    Slots are rows in a small SQLite database, so all processes see the same
+    counts. A request that finds its pool full waits in a short bounded
+    queue and is admitted in arrival order. If the queue is full, or no slot
+    frees up within MAX_WAIT, it is rejected with 429 and Retry-After. Every
+    slot has a lease that a background thread keeps renewing while the block
+    runs, so long ingests keep their slot and slots held by a crashed process
+    expire within LEASE_SECONDS.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._renewer_pid = None
+
+    @property
+    def config(self):
+        return settings.ADMISSION_CONTROL
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            path = self.config['DB_PATH']
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def admit(self, pool: str, user_id):
+        """Hold a slot in `pool` for the duration of the block, or raise Throttled."""
+        limits = self.config['POOLS'].get(pool)
+        if not limits:
+            yield
+            return
+        token = self._acquire(pool, user_id, limits)
+        self._hold(token)
+        try:
+            yield
+        finally:
+            self._unhold(token)
+            self._release(token)
+
+    def _acquire(self, pool, user_id, limits):
+        token = uuid.uuid4().hex
+        created_at = time.time()
+        deadline = time.monotonic() + limits['MAX_WAIT']
+        queued = False
+        connection = self._connection()
+
+        while True:
+            now = time.time()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute('DELETE FROM admission_slots WHERE expires_at < ?', (now,))
+                active_global, active_user = connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(user_id = ?), 0) FROM admission_slots "
+                    "WHERE pool = ? AND state = 'active'",
+                    (user_id, pool),
+                ).fetchone()
+                ahead_global, ahead_user = connection.execute(WAITERS_AHEAD, {
+                    'pool': pool, 'user_id': user_id, 'created_at': created_at, 'token': token,
+                    'per_user': limits['PER_USER'],
+                }).fetchone()
+                has_room = (
+                    (not limits['GLOBAL'] or active_global + ahead_global < limits['GLOBAL'])
+                    and (not limits['PER_USER'] or active_user + ahead_user < limits['PER_USER'])
+                )
+                if has_room:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO admission_slots VALUES (?, ?, ?, 'active', ?, ?)",
+                        (token, pool, user_id, created_at, now + self.config['LEASE_SECONDS']),
+                    )
+                    connection.execute('COMMIT')
+                    return token
+
+                if not queued:
+                    (waiting,) = connection.execute(
+                        "SELECT COUNT(*) FROM admission_slots WHERE pool = ? AND state = 'waiting'",
+                        (pool,),
+                    ).fetchone()
+                    if waiting >= limits['QUEUE'] or not limits['MAX_WAIT']:
+                        connection.execute('COMMIT')
+                        self._reject(pool, user_id, limits, 'queue full')
+                    connection.execute(
+                        "INSERT INTO admission_slots VALUES (?, ?, ?, 'waiting', ?, ?)",
+                        (token, pool, user_id, created_at, now + limits['MAX_WAIT'] + 1),
+                    )
+                    queued = True
+                connection.execute('COMMIT')
+            except Throttled:
+                raise
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+            if time.monotonic() >= deadline:
+                self._release(token)
+                self._reject(pool, user_id, limits, 'wait timed out')
+            time.sleep(POLL_INTERVAL)
+
+    def _release(self, token):
+        self._connection().execute('DELETE FROM admission_slots WHERE token = ?', (token,))
+
+    def _hold(self, token):
+        with self._held_lock:
+            self._held.add(token)
+            # One renewer per process; a forked worker starts its own
+            if self._renewer_pid != os.getpid():
+                self._renewer_pid = os.getpid()
+                threading.Thread(target=self._renew_leases, name='admission-lease-renewer', daemon=True).start()
+
+    def _unhold(self, token):
+        with self._held_lock:
+            self._held.discard(token)
+
+    def _renew_leases(self):
+        while True:
+            lease = self.config['LEASE_SECONDS']
+            time.sleep(lease / 3)
+            with self._held_lock:
+                tokens = list(self._held)
+            if not tokens:
+                continue
+            try:
+                self._connection().execute(
+                    f"UPDATE admission_slots SET expires_at = ? "
+                    f"WHERE token IN ({', '.join('?' * len(tokens))})",
+                    (time.time() + lease, *tokens),
+                )
+            except Exception as e:
+                logger.error(f"Error renewing admission leases: {str(e)}")
+
+    def _reject(self, pool, user_id, limits, reason):
+        logger.warning(f"Admission to {pool} rejected for user {user_id}: {reason}")
+        raise Throttled(wait=limits['RETRY_AFTER'])
+
+
+admission = AdmissionController()
@@ -1,21 +1,63 @@
 import time
 import logging
+import threading
 from typing import Dict, List
-from langchain_openai import ChatOpenAI
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
 from django.conf import settings
 from .document_processor import DocumentProcessor
+from .model_router import FakeModel, ModelRouter
 
 logger = logging.getLogger(__name__)
 
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Process-wide model router, so latency stats accumulate across requests."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            config = settings.LLM_ROUTING
+            if config['BACKEND'] == 'fake':
+                models = {tier: FakeModel(name) for tier, name in config['MODELS'].items()}
+            else:
+                from langchain_openai import ChatOpenAI
+
+                models = {}
+                for tier, name in config['MODELS'].items():
+                    llm = ChatOpenAI(
+                        temperature=0.1,
+                        model_name=name,
+                        openai_api_key=settings.OPENAI_API_KEY,
+                        request_timeout=config['DEADLINE_SECONDS'],
+                        max_retries=0
+                    )
+                    # The per-call timeout is what is left of the question's deadline
+                    models[tier] = lambda prompt, timeout, llm=llm: llm.invoke(prompt, timeout=timeout).content
+            _router = ModelRouter(
+                models,
+                deadline=config['DEADLINE_SECONDS'],
+                short_question_words=config['SHORT_QUESTION_WORDS'],
+                small_context_chars=config['SMALL_CONTEXT_CHARS'],
+                hedge=config['HEDGE'],
+                hedge_min_samples=config['HEDGE_MIN_SAMPLES'],
+                stats_window=config['STATS_WINDOW'],
+                cooldown=config['COOLDOWN_SECONDS'],
+                # Room for a primary and a hedge per admitted question
+                max_workers=2 * (settings.ADMISSION_CONTROL['POOLS']['qa']['GLOBAL'] or 16),
+            )
+        return _router
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question, used to recognise identical in-flight questions."""
+    return " ".join(question.casefold().split()).rstrip("?!. ")
+
 class AIServices:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            temperature=0.1,
-            model_name="gpt-4",
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        from langchain.prompts import PromptTemplate
+
+        self.router = get_router()
         self.document_processor = DocumentProcessor()
         
         # Custom prompt template
@@ -49,34 +91,32 @@ class AIServices:
             if not document.processed or not document.vector_store_id:
                 raise ValueError("Document is not processed yet")
             
-            vector_store = self.document_processor.get_vector_store(document.vector_store_id)
+            index = self.document_processor.get_index(document.vector_store_id)
             
-            # Create retrieval QA chain
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=vector_store.as_retriever(search_kwargs={"k": 5}),
-                chain_type_kwargs={"prompt": self.prompt_template},
-                return_source_documents=True
-            )
+            # Retrieve the most relevant chunks
+            query_embedding = self.document_processor.embed_query(question)
+            source_documents = index.search(query_embedding, k=5)
+            context = "\n\n".join(hit.text for hit in source_documents)
             
-            # Get answer
-            result = qa_chain({"query": question})
+            # Get answer from the model picked for this question and context size
+            prompt = self.prompt_template.format(context=context, question=question)
+            answer, model = self.router.complete(prompt, question=question, context=context)
             
             # Calculate response time
             response_time = time.time() - start_time
             
             # Calculate confidence score based on source similarity
-            confidence_score = self._calculate_confidence_score(result.get('source_documents', []))
+            confidence_score = self._calculate_confidence_score(source_documents)
             
             response = {
-                "answer": result['result'],
+                "answer": answer,
                 "confidence_score": confidence_score,
                 "response_time": response_time,
-                "source_count": len(result.get('source_documents', []))
+                "source_count": len(source_documents),
+                "model": model
             }
             
-            logger.info(f"Question answered successfully in {response_time:.2f} seconds")
+            logger.info(f"Question answered by {model} in {response_time:.2f} seconds")
             return response
             
         except Exception as e:
@@ -89,7 +129,7 @@ class AIServices:
             return 0.0
         
         # Simple confidence calculation based on number of sources and content length
-        avg_content_length = sum(len(doc.page_content) for doc in source_documents) / len(source_documents)
+        avg_content_length = sum(len(hit.text) for hit in source_documents) / len(source_documents)
         
         # Normalize score between 0.1 and 1.0
         confidence = min(0.1 + (len(source_documents) * 0.15) + (avg_content_length / 2000) * 0.3, 1.0)
@@ -1,26 +1,45 @@
-import os
 import logging
-from typing import List, Tuple
-import PyPDF2
-from docx import Document as DocxDocument
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from cachetools import LRUCache
 from django.conf import settings
+from .text_chunker import Chunk, TextChunker
+from .vector_index import VectorIndex
 
 logger = logging.getLogger(__name__)
 
+# PyPDF2, python-docx, langchain and chromadb (which pulls in onnxruntime) are
+# imported inside the methods that need them, so that importing this module
+# stays cheap for manage.py commands and requests that never touch ingestion.
+
+_embeddings = None
+_query_embeddings = LRUCache(maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE)
+_lock = threading.Lock()
+
+
+def get_embeddings():
+    """Process-wide OpenAI embeddings client, so its HTTP connections are reused."""
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            _embeddings = OpenAIEmbeddings(openai_api_key=settings.OPENAI_API_KEY)
+        return _embeddings
+
+
 class DocumentProcessor:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(openai_api_key=settings.OPENAI_API_KEY)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
+        self.embeddings = get_embeddings()
+        self.text_splitter = TextChunker(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            encoding_name=settings.CHUNK_TOKEN_ENCODING or None,
         )
 
-    def extract_text_from_file(self, file_path: str, file_type: str) -> str:
-        """Extract text from different file types."""
+    def extract_pages_from_file(self, file_path: str, file_type: str) -> List[Tuple[int, str]]:
+        """Extract (page number, text) pairs from different file types."""
         try:
             if file_type == 'txt':
                 return self._extract_from_txt(file_path)
@@ -34,52 +53,55 @@ class DocumentProcessor:
             logger.error(f"Error extracting text from {file_path}: {str(e)}")
             raise
 
-    def _extract_from_txt(self, file_path: str) -> str:
+    def _extract_from_txt(self, file_path: str) -> List[Tuple[int, str]]:
         """Extract text from TXT file."""
         with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+            return [(1, file.read())]
+
+    def _extract_from_pdf(self, file_path: str) -> List[Tuple[int, str]]:
+        """Extract text from PDF file, one entry per page."""
+        import PyPDF2
 
-    def _extract_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file."""
-        text = ""
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+            return [
+                (number, page.extract_text() or "")
+                for number, page in enumerate(pdf_reader.pages, start=1)
+            ]
 
-    def _extract_from_docx(self, file_path: str) -> str:
+    def _extract_from_docx(self, file_path: str) -> List[Tuple[int, str]]:
         """Extract text from DOCX file."""
+        from docx import Document as DocxDocument
+
         doc = DocxDocument(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return [(1, "\n".join(paragraph.text for paragraph in doc.paragraphs))]
+
+    def split_document(self, document_instance) -> List[Chunk]:
+        """Extract a document's text and split it into chunks."""
+        # Extract text from file
+        file_path = document_instance.file.path
+        pages = self.extract_pages_from_file(file_path, document_instance.file_type)
+        
+        if not any(text.strip() for _, text in pages):
+            raise ValueError("No text found in the document")
+
+        # Split text into chunks that remember their page and character span
+        return self.text_splitter.split_pages(pages)
+
+    def build_vector_store(self, document_instance, vector_store_id: Optional[str] = None) -> str:
+        """Create a vector store for a document without touching the document row."""
+        vector_store_id = vector_store_id or f"doc_{document_instance.id}"
+        chunks = self.split_document(document_instance)
+        
+        # Embed chunks and write the vector store (with a section index for large documents)
+        embeddings = self.embeddings.embed_documents([chunk.text for chunk in chunks])
+        VectorIndex.build(vector_store_id, chunks, embeddings)
+        return vector_store_id
 
     def process_document(self, document_instance) -> str:
         """Process document and create vector store."""
         try:
-            # Extract text from file
-            file_path = document_instance.file.path
-            text = self.extract_text_from_file(file_path, document_instance.file_type)
-            
-            if not text.strip():
-                raise ValueError("No text found in the document")
-
-            # Split text into chunks
-            chunks = self.text_splitter.split_text(text)
-            
-            # Create vector store
-            vector_store_id = f"doc_{document_instance.id}"
-            persist_directory = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, vector_store_id)
-            
-            # Create ChromaDB collection
-            vector_store = Chroma.from_texts(
-                texts=chunks,
-                embedding=self.embeddings,
-                persist_directory=persist_directory,
-                collection_name=vector_store_id
-            )
+            vector_store_id = self.build_vector_store(document_instance)
             
             # Update document instance
             document_instance.vector_store_id = vector_store_id
@@ -93,16 +115,108 @@ class DocumentProcessor:
             logger.error(f"Error processing document {document_instance.id}: {str(e)}")
             raise
 
-    def get_vector_store(self, vector_store_id: str):
-        """Get existing vector store."""
+    def process_documents(self, document_instances, max_workers: int = 4) -> Dict[str, Optional[str]]:
+        """Process several documents at once, returning an error message (or None) per document id.
+
+        Text extraction and store writes run on a thread pool, and the chunks of
+        several documents are embedded together so the embedding API sees full batches.
+        Rows are updated with a single bulk_update; the caller handles failures.
+        """
+        from ..models import Document
+
+        errors = {}
+        split = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(self.split_document, document_instance) for document_instance in document_instances]
+            for document_instance, future in zip(document_instances, futures):
+                try:
+                    split[document_instance.id] = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing document {document_instance.id}: {str(e)}")
+                    errors[str(document_instance.id)] = str(e)
+
+        pending = [document_instance for document_instance in document_instances if document_instance.id in split]
+
+        def build_one(document_instance, chunks, embeddings):
+            vector_store_id = f"doc_{document_instance.id}"
+            VectorIndex.build(vector_store_id, chunks, embeddings)
+            return vector_store_id
+
+        processed = []
+
+        def collect(builds):
+            for document_instance, future in builds:
+                try:
+                    document_instance.vector_store_id = future.result()
+                    document_instance.processed = True
+                    processed.append(document_instance)
+                except Exception as e:
+                    logger.error(f"Error processing document {document_instance.id}: {str(e)}")
+                    errors[str(document_instance.id)] = str(e)
+
+        # Embed batch by batch and write each batch's stores while the next one is embedded,
+        # so at most two batches of embeddings are held in memory.
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            builds = []
+            for batch in self._embedding_batches(pending, split):
+                texts = [chunk.text for document_instance in batch for chunk in split[document_instance.id]]
+                try:
+                    embeddings = self.embeddings.embed_documents(texts) if texts else []
+                except Exception as e:
+                    logger.error(f"Error embedding {len(batch)} documents: {str(e)}")
+                    errors.update({str(document_instance.id): str(e) for document_instance in batch})
+                    continue
+
+                collect(builds)
+                builds = []
+                start = 0
+                for document_instance in batch:
+                    chunks = split.pop(document_instance.id)
+                    builds.append((document_instance, pool.submit(
+                        build_one, document_instance, chunks, embeddings[start:start + len(chunks)]
+                    )))
+                    start += len(chunks)
+            collect(builds)
+
+        Document.objects.bulk_update(processed, ['vector_store_id', 'processed'])
+        for document_instance in processed:
+            errors[str(document_instance.id)] = None
+        logger.info(f"Processed {len(processed)} of {len(document_instances)} documents in bulk")
+        return errors
+
+    @staticmethod
+    def _embedding_batches(document_instances, split):
+        """Group documents into batches of about EMBEDDING_BATCH_CHUNKS chunks.
+
+        A document is never split across batches, so one larger than the limit
+        forms a batch of its own.
+        """
+        batch, size = [], 0
+        for document_instance in document_instances:
+            chunk_count = len(split[document_instance.id])
+            if batch and size + chunk_count > settings.EMBEDDING_BATCH_CHUNKS:
+                yield batch
+                batch, size = [], 0
+            batch.append(document_instance)
+            size += chunk_count
+        if batch:
+            yield batch
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing recent results for repeated queries."""
+        with _lock:
+            embedding = _query_embeddings.get(text)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(text)
+            with _lock:
+                _query_embeddings[text] = embedding
+        return embedding
+
+    def get_index(self, vector_store_id: str) -> VectorIndex:
+        """Get existing vector index."""
         try:
-            persist_directory = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, vector_store_id)
-            
-            return Chroma(
-                persist_directory=persist_directory,
-                embedding_function=self.embeddings,
-                collection_name=vector_store_id
-            )
+            return VectorIndex(vector_store_id)
         except Exception as e:
-            logger.error(f"Error loading vector store {vector_store_id}: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error(f"Error loading vector index {vector_store_id}: {str(e)}")
+            raise
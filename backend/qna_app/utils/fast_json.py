@@ -0,0 +1,51 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# UUIDs, datetimes and dataclasses are handled by orjson itself; UTC datetimes end in
+# "Z" as they do from DRF's DateTimeField, so payloads built straight from .values()
+# render the same as serializer output.
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_fallback = JSONEncoder()
+
+
+def _default(obj):
+    # Decimals, lazy translation strings, querysets and the like
+    return _fallback.default(obj)
+
+
+def dumps(data, indent: bool = False) -> bytes:
+    return orjson.dumps(data, default=_default, option=OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Drop-in replacement for DRF's JSONRenderer backed by orjson."""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = renderer_context.get('indent')
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            indent = True
+        return dumps(data, indent=bool(indent))
+
+
+class ORJSONParser(BaseParser):
+    """Drop-in replacement for DRF's JSONParser backed by orjson."""
+
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
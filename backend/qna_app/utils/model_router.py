@@ -0,0 +1,291 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A model is any callable taking (prompt, timeout in seconds) and returning the completion text;
+# the timeout is what is left of the caller's deadline when the call starts.
+Model = Callable[[str, float], str]
+
+FACTUAL_QUESTION = re.compile(
+    r"^(what|who|whom|when|where|which|how (many|much|long|old)|is|are|was|were|does|do|did|can|list|name)\b",
+    re.IGNORECASE,
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class LatencyStats:
+    """Rolling window of one model's call latencies and outcomes."""
+
+    def __init__(self, window: int):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._failures = deque(maxlen=window)
+
+    def record(self, seconds: float, ok: bool = True, timed_out: bool = False):
+        with self._lock:
+            # A timeout still tells us how slow the model is; other failures don't
+            if ok or timed_out:
+                self._latencies.append(seconds)
+            self._failures.append(0 if ok else 1)
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._failures.clear()
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def calls(self) -> int:
+        return len(self._failures)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    @property
+    def failure_rate(self) -> float:
+        with self._lock:
+            return sum(self._failures) / len(self._failures) if self._failures else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            'samples': self.samples,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'failure_rate': round(self.failure_rate, 3),
+        }
+
+
+class ModelRouter:
+    """Route completions between a fast and a large model under a deadline.
+
+    Short factual questions and small contexts go to the fast model, everything
+    else to the large one. A model whose recent p95 is past the deadline, or
+    whose calls mostly fail, is skipped in favour of the other; both need at
+    least `hedge_min_samples` calls of evidence. A skipped model gets one probe
+    request per `cooldown` seconds, and the first call that succeeds clears its
+    stats and puts it back in rotation. Each call must finish within the
+    deadline: calls get only the time left when they leave the executor queue,
+    and calls still queued at the deadline are cancelled. With hedging on, a
+    backup request is sent once the first call has run longer than the model's
+    p95, unless every worker is busy; the first answer to arrive wins.
+    """
+
+    def __init__(self, models: Dict[str, Model], fast: str = 'fast', large: str = 'large',
+                 deadline: float = 30.0, short_question_words: int = 15, small_context_chars: int = 3000,
+                 hedge: bool = True, hedge_min_samples: int = 20, stats_window: int = 200,
+                 cooldown: float = 30.0, max_workers: int = 32):
+        self.models = models
+        self.fast = fast
+        self.large = large
+        self.deadline = deadline
+        self.short_question_words = short_question_words
+        self.small_context_chars = small_context_chars
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.cooldown = cooldown
+        self.stats = {name: LatencyStats(stats_window) for name in models}
+        # Models currently routed around, with when they were last tried
+        self._tripped: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+        # Time calls spend waiting for a worker; it counts against the deadline but not the model
+        self.queue_wait = LatencyStats(stats_window)
+        self._in_flight = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._deadline_misses = 0
+        self._cancelled = 0
+
+    def choose(self, question: str, context: str) -> str:
+        """Pick the model for a question given the retrieved context."""
+        short_factual = (
+            len(question.split()) <= self.short_question_words
+            and FACTUAL_QUESTION.match(question.strip()) is not None
+        )
+        if short_factual or len(context) <= self.small_context_chars:
+            preferred, fallback = self.fast, self.large
+        else:
+            preferred, fallback = self.large, self.fast
+        if self._unhealthy(preferred) and not self._unhealthy(fallback):
+            if self._probe_due(preferred):
+                logger.info(f"Probing {preferred} after {self.cooldown}s cooldown")
+                return preferred
+            logger.info(f"Routing around {preferred}: {self.stats[preferred].snapshot()}")
+            return fallback
+        return preferred
+
+    def _unhealthy(self, name: str) -> bool:
+        stats = self.stats[name]
+        if stats.calls >= self.hedge_min_samples and stats.failure_rate > 0.5:
+            return True
+        p95 = stats.percentile(0.95)
+        return stats.samples >= self.hedge_min_samples and p95 is not None and p95 >= self.deadline
+
+    def _probe_due(self, name: str) -> bool:
+        """True at most once per cooldown for a model that is being routed around."""
+        now = time.monotonic()
+        with self._lock:
+            last_tried = self._tripped.setdefault(name, now)
+            if now - last_tried < self.cooldown:
+                return False
+            self._tripped[name] = now
+            return True
+
+    def _recovered(self, name: str):
+        with self._lock:
+            if self._tripped.pop(name, None) is None:
+                return
+        self.stats[name].reset()
+        logger.info(f"{name} answered again; routing to it normally")
+
+    def complete(self, prompt: str, question: str, context: str,
+                 model: Optional[str] = None) -> Tuple[str, str]:
+        """Return (completion, model name), raising DeadlineExceeded past the deadline."""
+        name = model or self.choose(question, context)
+        started = time.monotonic()
+        deadline_at = started + self.deadline
+
+        futures = {self._submit(name, prompt, deadline_at): 'primary'}
+        hedge_after = self._hedge_delay(name)
+        if hedge_after is not None:
+            done, _ = wait(futures, timeout=min(hedge_after, self.deadline))
+            if not done and not self._saturated():
+                with self._lock:
+                    self._hedges += 1
+                futures[self._submit(name, prompt, deadline_at)] = 'hedge'
+                logger.debug(f"Hedging {name} after {hedge_after:.2f}s")
+
+        while futures:
+            remaining = deadline_at - time.monotonic()
+            done, _ = wait(futures, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                kind = futures.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    logger.warning(f"{kind} call to {name} failed: {str(e)}")
+                    continue
+                if kind == 'hedge':
+                    with self._lock:
+                        self._hedge_wins += 1
+                return text, name
+
+        # Calls time out on their own at the deadline, so a failure that late is a deadline miss too
+        if futures or time.monotonic() >= deadline_at:
+            # Calls that never left the queue would only spend money on an answer nobody reads
+            cancelled = sum(future.cancel() for future in futures)
+            with self._lock:
+                self._deadline_misses += 1
+                self._cancelled += cancelled
+            raise DeadlineExceeded(f"{name} did not answer within {self.deadline}s")
+        raise RuntimeError(f"All calls to {name} failed")
+
+    def _saturated(self) -> bool:
+        with self._lock:
+            return self._in_flight >= self.max_workers
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        if not self.hedge or self.stats[name].samples < self.hedge_min_samples:
+            return None
+        return self.stats[name].percentile(0.95)
+
+    def _submit(self, name: str, prompt: str, deadline_at: float):
+        model = self.models[name]
+        stats = self.stats[name]
+        submitted = time.monotonic()
+
+        def call():
+            started = time.monotonic()
+            self.queue_wait.record(started - submitted)
+            timeout = deadline_at - started
+            if timeout <= 0:
+                # Reached a worker just before the caller got round to cancelling it
+                with self._lock:
+                    self._cancelled += 1
+                raise DeadlineExceeded(f"{name} call waited past the deadline for a worker")
+            try:
+                text = model(prompt, timeout)
+            except Exception:
+                elapsed = time.monotonic() - started
+                stats.record(elapsed, ok=False, timed_out=elapsed >= timeout)
+                raise
+            stats.record(time.monotonic() - started)
+            self._recovered(name)
+            return text
+
+        with self._lock:
+            self._in_flight += 1
+        future = self.executor.submit(call)
+        # Also runs for futures cancelled before they started
+        future.add_done_callback(self._call_done)
+        return future
+
+    def _call_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {
+                'routed_around': sorted(self._tripped),
+                'in_flight': self._in_flight,
+                'hedges': self._hedges,
+                'hedge_wins': self._hedge_wins,
+                'deadline_misses': self._deadline_misses,
+                'cancelled': self._cancelled,
+            }
+        return {
+            'models': {name: stats.snapshot() for name, stats in self.stats.items()},
+            'queue_wait': {'p50': self.queue_wait.percentile(0.5), 'p95': self.queue_wait.percentile(0.95)},
+            **counters,
+        }
+
+
+class FakeModel:
+    """Local stand-in for an LLM with configurable latency, tail latency and failure rate."""
+
+    def __init__(self, name: str, latency: float = 0.2, jitter: float = 0.05,
+                 tail_probability: float = 0.0, tail_latency: float = 5.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_probability = tail_probability
+        self.tail_latency = tail_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str, timeout: float) -> str:
+        with self._lock:
+            self.calls += 1
+            slow = self.random.random() < self.tail_probability
+            fail = self.random.random() < self.failure_rate
+            delay = self.tail_latency if slow else max(0.0, self.random.gauss(self.latency, self.jitter))
+        time.sleep(min(delay, timeout))
+        if fail:
+            raise RuntimeError(f"{self.name} failed")
+        if delay > timeout:
+            raise TimeoutError(f"{self.name} timed out")
+        return f"[{self.name}] answer to: {prompt[-80:]}"
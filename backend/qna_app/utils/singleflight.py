@@ -0,0 +1,62 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run a function once per key at a time and share its result with concurrent callers.
+
+    While a call for a key is in flight, other threads asking for the same key
+    wait for it and receive its result (or exception) instead of repeating
+    the work. Nothing is cached once the call finishes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (result, shared) where `shared` is True if another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                self._coalesced += 1
+                coalesced = self._coalesced
+
+        if not leader:
+            logger.info(f"{self.name}: coalesced duplicate call ({coalesced} so far)")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'executed': self._executed, 'coalesced': self._coalesced, 'in_flight': len(self._calls)}
@@ -0,0 +1,113 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+from django.db import connection, transaction
+
+from .vector_index import store_path
+
+logger = logging.getLogger(__name__)
+
+# Written into a store when a re-index swaps it out; gc_storage counts its grace period from then.
+RETIRED_MARKER = '.retired_at'
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under `path`."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def remove_store(vector_store_id: str) -> int:
+    """Delete a vector store directory and return the bytes reclaimed."""
+    path = store_path(vector_store_id)
+    if not os.path.isdir(path):
+        return 0
+    size = directory_size(path)
+    shutil.rmtree(path, ignore_errors=True)
+    return size
+
+
+def mark_retired(vector_store_id: str):
+    """Record that a store is about to stop being referenced, so it is not collected at once."""
+    path = store_path(vector_store_id)
+    if os.path.isdir(path):
+        with open(os.path.join(path, RETIRED_MARKER), 'w') as marker_file:
+            marker_file.write(str(time.time()))
+
+
+def last_used(vector_store_id: str) -> float:
+    """Timestamp of the last write to a store or of its retirement, whichever is later."""
+    path = store_path(vector_store_id)
+    timestamp = os.stat(path).st_mtime
+    try:
+        with open(os.path.join(path, RETIRED_MARKER)) as marker_file:
+            timestamp = max(timestamp, float(marker_file.read()))
+    except (FileNotFoundError, ValueError):
+        pass
+    return timestamp
+
+
+def remove_file(field_file) -> int:
+    """Delete an uploaded file from storage and return the bytes reclaimed."""
+    if not field_file or not field_file.name or not field_file.storage.exists(field_file.name):
+        return 0
+    size = field_file.size
+    field_file.delete(save=False)
+    return size
+
+
+def discard_document(document) -> int:
+    """Remove a document row with everything written for it so far.
+
+    Used when ingestion fails part-way and by the reclaimer, so the vector
+    store (including a partially written one) and the uploaded file never
+    outlive the row.
+    """
+    reclaimed = 0
+    store_ids = {f"doc_{document.id}"}
+    if document.vector_store_id:
+        store_ids.add(document.vector_store_id)
+    for vector_store_id in store_ids:
+        reclaimed += remove_store(vector_store_id)
+    reclaimed += remove_file(document.file)
+    document.delete()
+    return reclaimed
+
+
+def reclaim_deleted_document(document_id) -> int:
+    """Hard-delete a soft-deleted document and free its storage."""
+    from ..models import Document
+
+    document = Document.objects.deleted().filter(id=document_id).first()
+    if document is None:
+        return 0
+    reclaimed = discard_document(document)
+    logger.info(f"Reclaimed {reclaimed} bytes for deleted document {document_id}")
+    return reclaimed
+
+
+def schedule_reclaim(document_id):
+    """Reclaim a soft-deleted document on a background thread once the transaction commits.
+
+    If the process dies first, `manage.py gc_storage` picks the document up later.
+    """
+    def run():
+        try:
+            reclaim_deleted_document(document_id)
+        except Exception as e:
+            logger.error(f"Background reclaim of document {document_id} failed: {str(e)}")
+        finally:
+            connection.close()
+
+    transaction.on_commit(
+        lambda: threading.Thread(target=run, name=f"reclaim-{document_id}", daemon=True).start()
+    )
@@ -0,0 +1,133 @@
+import bisect
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Boundaries tried from the end of a window backwards, strongest first.
+PARAGRAPH_SEPARATORS = ("\n\n",)
+SENTENCE_SEPARATORS = (". ", "? ", "! ", ".\n", "?\n", "!\n")
+LINE_SEPARATORS = ("\n",)
+WORD_SEPARATORS = (" ", "\t")
+
+
+@dataclass
+class Chunk:
+    text: str
+    page: int
+    start: int
+    end: int
+
+    def metadata(self) -> dict:
+        return {"page": self.page, "start": self.start, "end": self.end}
+
+
+class TextChunker:
+    """Split text into overlapping chunks in a single forward scan.
+
+    Each window is cut at the strongest boundary (paragraph, sentence, line,
+    word) found in its last part, and every chunk keeps its source page and
+    character span. Sizes are measured in characters, or in tokens when a
+    tiktoken encoding name is given.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 encoding_name: Optional[str] = None, min_fill: float = 0.5):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding_name = encoding_name
+        self.min_fill = min_fill
+
+    def split_text(self, text: str) -> List[str]:
+        """Split plain text, mirroring the LangChain splitter interface."""
+        return [chunk.text for chunk in self.split_pages([(1, text)])]
+
+    def split_pages(self, pages: Sequence[Tuple[int, str]]) -> List[Chunk]:
+        """Split (page number, text) pairs into chunks with source offsets.
+
+        Offsets refer to the text of all pages joined by newlines.
+        """
+        page_numbers = []
+        page_starts = []
+        parts = []
+        offset = 0
+        for page_number, page_text in pages:
+            page_numbers.append(page_number)
+            page_starts.append(offset)
+            parts.append(page_text)
+            offset += len(page_text) + 1
+        text = "\n".join(parts)
+
+        window_end, overlap_start = self._measures(text)
+        chunks = []
+        length = len(text)
+        start = self._skip_whitespace(text, 0, length)
+
+        while start < length:
+            limit = window_end(start)
+            if limit >= length:
+                end = length
+            else:
+                end = self._find_boundary(text, start + int((limit - start) * self.min_fill), limit)
+            # `start` always sits on a non-whitespace character here.
+            chunk_text = text[start:end].rstrip()
+            if chunk_text:
+                page_index = bisect.bisect_right(page_starts, start) - 1
+                chunks.append(Chunk(
+                    text=chunk_text,
+                    page=page_numbers[page_index],
+                    start=start,
+                    end=start + len(chunk_text),
+                ))
+            if end >= length:
+                break
+
+            next_start = overlap_start(start, end)
+            if next_start > start:
+                # Begin the overlap on a word boundary rather than mid-word.
+                space = text.find(" ", next_start, end)
+                if space != -1:
+                    next_start = space
+            start = self._skip_whitespace(text, max(next_start, start + 1), length)
+
+        return chunks
+
+    def _measures(self, text: str) -> Tuple[Callable[[int], int], Callable[[int, int], int]]:
+        """Return functions giving a window's end and the next window's start."""
+        if not self.encoding_name:
+            return (
+                lambda start: start + self.chunk_size,
+                lambda start, end: end - self.chunk_overlap,
+            )
+
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(self.encoding_name)
+        _, offsets = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+        length = len(text)
+
+        def window_end(start):
+            index = bisect.bisect_left(offsets, start) + self.chunk_size
+            return offsets[index] if index < len(offsets) else length
+
+        def overlap_start(start, end):
+            index = bisect.bisect_left(offsets, end) - self.chunk_overlap
+            return offsets[index] if index > 0 else start
+
+        return window_end, overlap_start
+
+    @staticmethod
+    def _find_boundary(text: str, low: int, high: int) -> int:
+        """Return the end of the strongest boundary in text[low:high], or high."""
+        for separators in (PARAGRAPH_SEPARATORS, SENTENCE_SEPARATORS,
+                           LINE_SEPARATORS, WORD_SEPARATORS):
+            best = max(text.rfind(separator, low, high) for separator in separators)
+            if best != -1:
+                return best + 1
+        return high
+
+    @staticmethod
+    def _skip_whitespace(text: str, position: int, length: int) -> int:
+        while position < length and text[position].isspace():
+            position += 1
+        return position
@@ -0,0 +1,406 @@
+import json
+import logging
+import os
+import random
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .text_chunker import Chunk
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'index.json'
+SECTIONS_COLLECTION = 'sections'
+
+# Storage formats: 'float32' keeps chunks in a Chroma collection, the compact
+# formats keep them in .npy files searched with numpy.
+STORAGE_FORMATS = ('float32', 'float16', 'int8')
+COMPACT_VECTORS = 'vectors.npy'
+COMPACT_SCALES = 'scales.npy'
+FULL_VECTORS = 'full.npy'
+SECTION_CENTROIDS = 'sections.npy'
+CHUNK_TEXTS = 'chunks.jsonl'
+CHUNK_OFFSETS = 'chunk_offsets.npy'
+
+# Rows converted to float32 at a time during the compact first pass.
+SCAN_BLOCK_ROWS = 16384
+
+# chromadb and numpy are imported lazily, see document_processor.py.
+
+
+@dataclass
+class SearchHit:
+    text: str
+    score: float
+    metadata: dict = field(default_factory=dict)
+    position: Optional[int] = None
+
+
+def store_path(vector_store_id: str) -> str:
+    return os.path.join(settings.CHROMA_PERSIST_DIRECTORY, vector_store_id)
+
+
+def quantize(vectors, storage: str) -> Tuple:
+    """Return (compact vectors, per-vector scales) for a float32 matrix.
+
+    int8 vectors are scaled so that each row's largest component maps to 127;
+    float16 vectors need no scale and return None.
+    """
+    import numpy as np
+
+    if storage == 'float16':
+        return vectors.astype(np.float16), None
+    if storage == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        compact = np.round(vectors / scales[:, None]).astype(np.int8)
+        return compact, scales.astype(np.float32)
+    raise ValueError(f"Unsupported embedding storage: {storage}")
+
+
+def dequantize(compact, scales):
+    import numpy as np
+
+    vectors = compact.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+def compact_search(query, compact, scales, full, k: int, candidates: int,
+                   ranges: Optional[Sequence[Tuple[int, int]]] = None) -> List[Tuple[int, float]]:
+    """Rank rows of a compact matrix against a float32 query.
+
+    The first pass scores every row in `ranges` on the compact vectors. With
+    a float32 copy (`full`), the best `candidates` rows are then re-scored
+    against it. Without one there is no second pass: the first-pass scores are
+    already those of the dequantized vectors, so the best `k` rows are returned
+    as they are. Returns (row, score) pairs, best first.
+    """
+    import numpy as np
+
+    query = np.asarray(query, dtype=np.float32)
+    ranges = ranges or [(0, len(compact))]
+    rows = []
+    scores = []
+    for low, high in ranges:
+        for start in range(low, high, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, high)
+            block = np.asarray(compact[start:stop], dtype=np.float32) @ query
+            if scales is not None:
+                block *= scales[start:stop]
+            rows.append(np.arange(start, stop))
+            scores.append(block)
+    if not rows:
+        return []
+    rows = np.concatenate(rows)
+    scores = np.concatenate(scores)
+
+    if full is None:
+        top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    candidates = min(max(candidates, k), len(rows))
+    shortlist = np.sort(rows[np.argpartition(-scores, candidates - 1)[:candidates]])
+    exact = np.asarray(full[shortlist], dtype=np.float32) @ query
+    order = np.argsort(-exact)[:k]
+    return [(int(shortlist[i]), float(exact[i])) for i in order]
+
+
+class VectorIndex:
+    """Per-document vector store with an optional coarse section index.
+
+    With the default float32 storage, chunks live in a Chroma collection named
+    after the store, which keeps the store readable by LangChain's Chroma
+    wrapper. With EMBEDDING_STORAGE set to float16 or int8, embeddings are kept
+    as compact .npy matrices (int8 with a per-vector scale) and searched in
+    one pass on those. With EMBEDDING_RESCORE_FULL_PRECISION a float32 copy
+    is kept next to them and the top candidates are re-scored against it.
+    Large documents also get one centroid per run of consecutive chunks;
+    queries then pick the closest sections first and only search their chunks.
+    """
+
+    def __init__(self, vector_store_id: str):
+        self.vector_store_id = vector_store_id
+        self.path = store_path(vector_store_id)
+        self.manifest = self._read_manifest()
+        self._client = None
+
+    @property
+    def storage(self) -> str:
+        return self.manifest.get('storage', 'float32')
+
+    @property
+    def client(self):
+        if self._client is None:
+            import chromadb
+
+            self._client = chromadb.PersistentClient(path=self.path)
+        return self._client
+
+    @property
+    def hierarchical(self) -> bool:
+        return bool(self.manifest.get('sections'))
+
+    @property
+    def has_full_precision(self) -> bool:
+        return self.storage == 'float32' or os.path.exists(os.path.join(self.path, FULL_VECTORS))
+
+    @classmethod
+    def build(cls, vector_store_id: str, chunks: Sequence, embeddings: Sequence[Sequence[float]],
+              section_size: Optional[int] = None, storage: Optional[str] = None,
+              full_precision: Optional[bool] = None) -> 'VectorIndex':
+        """Write chunks and their embeddings to a new store.
+
+        `section_size` consecutive chunks are grouped into a section when the
+        document has at least HIERARCHICAL_INDEX_MIN_CHUNKS chunks.
+        `full_precision` (default EMBEDDING_RESCORE_FULL_PRECISION) also keeps
+        a float32 copy of compact stores for re-scoring.
+        """
+        import numpy as np
+
+        storage = storage or settings.EMBEDDING_STORAGE
+        if full_precision is None:
+            full_precision = settings.EMBEDDING_RESCORE_FULL_PRECISION
+        if storage not in STORAGE_FORMATS:
+            raise ValueError(f"Unsupported embedding storage: {storage}")
+        if section_size is None:
+            min_chunks = settings.HIERARCHICAL_INDEX_MIN_CHUNKS
+            if min_chunks and len(chunks) >= min_chunks:
+                section_size = settings.HIERARCHICAL_SECTION_SIZE
+
+        index = cls(vector_store_id)
+        os.makedirs(index.path, exist_ok=True)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+
+        metadatas = []
+        for position, chunk in enumerate(chunks):
+            metadata = chunk.metadata()
+            if section_size:
+                metadata['section'] = position // section_size
+            metadatas.append(metadata)
+
+        centroids = []
+        if section_size:
+            for start in range(0, len(vectors), section_size):
+                centroid = vectors[start:start + section_size].mean(axis=0)
+                norm = np.linalg.norm(centroid)
+                centroids.append(centroid / norm if norm else centroid)
+
+        if storage == 'float32':
+            index._write_chroma(chunks, vectors, metadatas, centroids)
+        else:
+            index._write_compact(chunks, vectors, metadatas, centroids, storage, full_precision)
+
+        index.manifest = {
+            'storage': storage,
+            'chunks': len(chunks),
+            'dimensions': int(vectors.shape[1]) if len(vectors) else 0,
+            'section_size': section_size or 0,
+            'sections': len(centroids),
+        }
+        with open(os.path.join(index.path, MANIFEST_NAME), 'w') as manifest_file:
+            json.dump(index.manifest, manifest_file)
+
+        logger.info(
+            f"Built {storage} vector store {vector_store_id} with {len(chunks)} chunks "
+            f"and {len(centroids)} sections"
+        )
+        return index
+
+    def _write_chroma(self, chunks, vectors, metadatas, centroids):
+        collection = self.client.get_or_create_collection(name=self.vector_store_id)
+        batch_size = self.client.get_max_batch_size()
+        for offset in range(0, len(chunks), batch_size):
+            stop = min(offset + batch_size, len(chunks))
+            collection.add(
+                ids=[f"chunk-{position}" for position in range(offset, stop)],
+                embeddings=vectors[offset:stop].tolist(),
+                documents=[chunk.text for chunk in chunks[offset:stop]],
+                metadatas=metadatas[offset:stop],
+            )
+
+        if centroids:
+            sections = self.client.get_or_create_collection(name=SECTIONS_COLLECTION)
+            for offset in range(0, len(centroids), batch_size):
+                stop = min(offset + batch_size, len(centroids))
+                sections.add(
+                    ids=[f"section-{number}" for number in range(offset, stop)],
+                    embeddings=[centroid.tolist() for centroid in centroids[offset:stop]],
+                    metadatas=[{'section': number} for number in range(offset, stop)],
+                )
+
+    def _write_compact(self, chunks, vectors, metadatas, centroids, storage, full_precision):
+        import numpy as np
+
+        compact, scales = quantize(vectors, storage)
+        np.save(os.path.join(self.path, COMPACT_VECTORS), compact)
+        if scales is not None:
+            np.save(os.path.join(self.path, COMPACT_SCALES), scales)
+        if full_precision:
+            np.save(os.path.join(self.path, FULL_VECTORS), vectors)
+        if centroids:
+            np.save(os.path.join(self.path, SECTION_CENTROIDS), np.asarray(centroids, dtype=np.float32))
+
+        # Texts are stored one JSON object per line so a query only reads the lines it returns.
+        offsets = []
+        with open(os.path.join(self.path, CHUNK_TEXTS), 'wb') as texts_file:
+            for chunk, metadata in zip(chunks, metadatas):
+                offsets.append(texts_file.tell())
+                texts_file.write(json.dumps({'text': chunk.text, 'metadata': metadata}).encode('utf-8') + b'\n')
+        np.save(os.path.join(self.path, CHUNK_OFFSETS), np.asarray(offsets, dtype=np.int64))
+
+    def search(self, query_embedding: Sequence[float], k: int = 5,
+               top_sections: Optional[int] = None, flat: bool = False) -> List[SearchHit]:
+        """Return the `k` chunks closest to the query embedding, best first."""
+        sections = None
+        if self.hierarchical and not flat:
+            sections = self.select_sections(query_embedding, top_sections)
+
+        if self.storage == 'float32':
+            return self._search_chroma(query_embedding, k, sections)
+        return self._search_compact(query_embedding, k, sections)
+
+    def _search_chroma(self, query_embedding, k, sections) -> List[SearchHit]:
+        collection = self.client.get_collection(name=self.vector_store_id)
+        result = collection.query(
+            query_embeddings=[list(query_embedding)],
+            n_results=k,
+            where={'section': {'$in': sections}} if sections is not None else None,
+            include=['documents', 'metadatas', 'distances'],
+        )
+        return [
+            # Embeddings are unit length, so squared L2 distance maps to cosine similarity.
+            SearchHit(
+                text=text,
+                score=round(1 - distance / 2, 4),
+                metadata=metadata or {},
+                position=int(chunk_id[len('chunk-'):]) if chunk_id.startswith('chunk-') else None,
+            )
+            for chunk_id, text, metadata, distance in zip(
+                result['ids'][0], result['documents'][0], result['metadatas'][0], result['distances'][0]
+            )
+        ]
+
+    def _search_compact(self, query_embedding, k, sections) -> List[SearchHit]:
+        compact, scales, full = self._load_compact()
+        ranges = None
+        if sections is not None:
+            size = self.manifest['section_size']
+            ranges = sorted((number * size, min((number + 1) * size, len(compact))) for number in sections)
+
+        ranked = compact_search(
+            query_embedding, compact, scales, full, k,
+            candidates=k * settings.EMBEDDING_RESCORE_CANDIDATES, ranges=ranges,
+        )
+        records = self._read_chunks([row for row, _ in ranked])
+        return [
+            SearchHit(text=record['text'], score=round(score, 4), metadata=record['metadata'], position=row)
+            for (row, score), record in zip(ranked, records)
+        ]
+
+    def select_sections(self, query_embedding: Sequence[float], top_sections: Optional[int] = None) -> List[int]:
+        """Return the numbers of the sections whose centroids are closest to the query."""
+        top_sections = min(top_sections or settings.HIERARCHICAL_TOP_SECTIONS, self.manifest['sections'])
+
+        if self.storage != 'float32':
+            import numpy as np
+
+            centroids = np.load(os.path.join(self.path, SECTION_CENTROIDS))
+            scores = centroids @ np.asarray(query_embedding, dtype=np.float32)
+            return [int(number) for number in np.argsort(-scores)[:top_sections]]
+
+        sections = self.client.get_collection(name=SECTIONS_COLLECTION)
+        result = sections.query(
+            query_embeddings=[list(query_embedding)],
+            n_results=top_sections,
+            include=['metadatas'],
+        )
+        return [metadata['section'] for metadata in result['metadatas'][0]]
+
+    def get_embeddings(self, positions: Sequence[int]):
+        """Return the float32 embeddings of the chunks at `positions`, in order."""
+        import numpy as np
+
+        if self.storage == 'float32':
+            collection = self.client.get_collection(name=self.vector_store_id)
+            ids = [f"chunk-{position}" for position in positions]
+            result = collection.get(ids=ids, include=['embeddings'])
+            by_id = dict(zip(result['ids'], result['embeddings']))
+            return np.asarray([by_id[chunk_id] for chunk_id in ids], dtype=np.float32)
+
+        compact, scales, full = self._load_compact()
+        rows = np.asarray(positions)
+        if full is not None:
+            return np.asarray(full[rows], dtype=np.float32)
+        return dequantize(np.asarray(compact[rows]), None if scales is None else scales[rows])
+
+    def sample_queries(self, count: int, noise: float, seed: int):
+        """Return `count` synthetic unit-length queries for evaluations.
+
+        Each is the embedding of a randomly sampled chunk nudged by a random
+        vector of length `noise`, so no embedding calls are needed.
+        """
+        import numpy as np
+
+        rng = random.Random(seed)
+        noise_rng = np.random.default_rng(seed)
+        sample = [rng.randrange(self.manifest['chunks']) for _ in range(count)]
+        queries = self.get_embeddings(sample)
+        offsets = noise_rng.standard_normal(queries.shape).astype(np.float32)
+        offsets *= noise / np.linalg.norm(offsets, axis=1, keepdims=True)
+        queries += offsets
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        return queries
+
+    def get_chunks(self, positions: Sequence[int]) -> List[Chunk]:
+        """Return the chunks at `positions`, in order."""
+        if self.storage == 'float32':
+            collection = self.client.get_collection(name=self.vector_store_id)
+            ids = [f"chunk-{position}" for position in positions]
+            result = collection.get(ids=ids, include=['documents', 'metadatas'])
+            by_id = {
+                chunk_id: {'text': text, 'metadata': metadata or {}}
+                for chunk_id, text, metadata in zip(result['ids'], result['documents'], result['metadatas'])
+            }
+            records = [by_id[chunk_id] for chunk_id in ids]
+        else:
+            records = self._read_chunks(positions)
+        return [
+            Chunk(text=record['text'], page=record['metadata'].get('page'),
+                  start=record['metadata'].get('start'), end=record['metadata'].get('end'))
+            for record in records
+        ]
+
+    def _load_compact(self):
+        import numpy as np
+
+        # Memory-mapped, so only the pages a query touches are read.
+        def load(name):
+            path = os.path.join(self.path, name)
+            return np.load(path, mmap_mode='r') if os.path.exists(path) else None
+
+        scales = load(COMPACT_SCALES)
+        return load(COMPACT_VECTORS), None if scales is None else np.asarray(scales), load(FULL_VECTORS)
+
+    def _read_chunks(self, rows: Sequence[int]) -> List[dict]:
+        import numpy as np
+
+        offsets = np.load(os.path.join(self.path, CHUNK_OFFSETS), mmap_mode='r')
+        records = []
+        with open(os.path.join(self.path, CHUNK_TEXTS), 'rb') as texts_file:
+            for row in rows:
+                texts_file.seek(int(offsets[row]))
+                records.append(json.loads(texts_file.readline()))
+        return records
+
+    def _read_manifest(self) -> dict:
+        # Stores built before the manifest existed are plain flat float32 collections.
+        try:
+            with open(os.path.join(self.path, MANIFEST_NAME)) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {}
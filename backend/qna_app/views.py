@@ -1,27 +1,62 @@
 import logging
+import os
+import time
+import zipfile
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView, CreateAPIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import F
 from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
 from .models import Document, QASession
 from .serializers import (
-    UserRegistrationSerializer, UserSerializer, DocumentUploadSerializer,
-    DocumentSerializer, QARequestSerializer, QAResponseSerializer, QAHistorySerializer
+    UserRegistrationSerializer, UserSerializer, DocumentUploadSerializer, BulkDocumentUploadSerializer,
+    DocumentSerializer, SearchQuerySerializer, SearchHitSerializer, QARequestSerializer,
+    QAResponseSerializer, QAHistorySerializer, validate_upload
 )
 from .utils.document_processor import DocumentProcessor
-from .utils.ai_services import AIServices
+from .utils.ai_services import AIServices, normalize_question
+from .utils.storage import discard_document, schedule_reclaim
+from .utils.admission import admission
+from .utils.singleflight import SingleFlight
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 logger = logging.getLogger(__name__)
 
+# Identical questions asked about the same document at the same time share one retrieval + LLM call
+question_flight = SingleFlight('qa')
+
 # Create your views here.
 
+class ValuesListMixin:
+    """Serve a read-only list straight from a `.values()` query, skipping the serializer.
+
+    `values_fields` (and `values_expressions` for renamed or related fields) must
+    produce the same keys as `serializer_class`, which still documents the schema.
+    """
+    values_fields = ()
+    values_expressions = {}
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *self.values_fields, **self.values_expressions
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(queryset))
+
 
 
 # Authentication Views
@@ -96,41 +131,145 @@ class DocumentUploadView(APIView):
             file = serializer.validated_data['file']
             title = serializer.validated_data.get('title', file.name)
             
-            # Create document instance
-            document = Document.objects.create(
-                user=request.user,
-                title=title,
-                file=file,
-                file_type=file.name.split('.')[-1].lower(),
-                file_size=file.size
+            # Limit concurrent ingestion per user and overall (429 when saturated)
+            with admission.admit('ingest', request.user.id):
+                # Create document instance
+                document = Document.objects.create(
+                    user=request.user,
+                    title=title,
+                    file=file,
+                    file_type=file.name.split('.')[-1].lower(),
+                    file_size=file.size
+                )
+                
+                try:
+                    # Process document in background (or synchronously for simplicity)
+                    processor = DocumentProcessor()
+                    processor.process_document(document)
+                    
+                    return Response(
+                        DocumentSerializer(document).data, 
+                        status=status.HTTP_201_CREATED
+                    )
+                    
+                except Exception as e:
+                    # Clean up the row, any partially written vector store and the uploaded file
+                    logger.error(f"Document processing failed: {str(e)}")
+                    discard_document(document)
+                    return Response(
+                        {'error': 'Failed to process document'}, 
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    )
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class BulkDocumentUploadView(APIView):
+    
+    @swagger_auto_schema(
+        request_body=BulkDocumentUploadSerializer,
+        responses={
+            201: 'All files processed',
+            207: 'Per-file status, some files rejected or failed',
+            413: 'Request body larger than BULK_UPLOAD_MAX_TOTAL_SIZE'
+        }
+    )
+    def post(self, request):
+        # Refuse oversized bodies before request.data parses (and spools) every part
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > settings.BULK_UPLOAD_MAX_TOTAL_SIZE:
+            return Response(
+                {'error': f"Request body cannot exceed {filesizeformat(settings.BULK_UPLOAD_MAX_TOTAL_SIZE)}"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
             )
+        
+        serializer = BulkDocumentUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # A bulk upload holds a single ingestion slot for the whole batch
+        with admission.admit('ingest', request.user.id):
+            return self._upload_all(request, serializer.validated_data)
+    
+    def _upload_all(self, request, data):
+        results = []
+        documents = []
+        errors = {}
+        file_field = Document._meta.get_field('file')
+        
+        for name, size, open_file in self._iter_uploads(data):
+            try:
+                validate_upload(name, size)
+                if len(documents) >= settings.BULK_UPLOAD_MAX_FILES:
+                    raise ValidationError(f"At most {settings.BULK_UPLOAD_MAX_FILES} files per request")
+            except ValidationError as e:
+                results.append({'file': name, 'status': 'rejected', 'error': e.detail[0]})
+                continue
             
+            # Stream the file (or archive entry) straight to storage
+            with open_file() as content:
+                stored_name = default_storage.save(
+                    file_field.generate_filename(None, name), File(content, name=name)
+                )
+            document = Document(
+                user=request.user,
+                title=name,
+                file=stored_name,
+                file_type=name.split('.')[-1].lower(),
+                file_size=size
+            )
+            documents.append(document)
+            results.append({'file': name, 'document': document})
+        
+        if documents:
+            Document.objects.bulk_create(documents)
             try:
-                # Process document in background (or synchronously for simplicity)
                 processor = DocumentProcessor()
-                processor.process_document(document)
-                
-                return Response(
-                    DocumentSerializer(document).data, 
-                    status=status.HTTP_201_CREATED
-                )
-                
+                errors = processor.process_documents(documents, max_workers=settings.BULK_UPLOAD_WORKERS)
             except Exception as e:
-                # Clean up if processing fails
-                document.delete()
-                logger.error(f"Document processing failed: {str(e)}")
-                return Response(
-                    {'error': 'Failed to process document'}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+                logger.error(f"Bulk document processing failed: {str(e)}")
+                errors = {str(document.id): str(e) for document in documents}
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        all_processed = True
+        for result in results:
+            document = result.pop('document', None)
+            if document is None:
+                all_processed = False
+            elif errors.get(str(document.id)) is None:
+                result.update(status='processed', document=DocumentSerializer(document).data)
+            else:
+                # Clean up the row, any partially written vector store and the uploaded file
+                discard_document(document)
+                result.update(status='failed', error='Failed to process document')
+                all_processed = False
+        
+        return Response(
+            {'results': results},
+            status=status.HTTP_201_CREATED if all_processed else status.HTTP_207_MULTI_STATUS
+        )
+    
+    def _iter_uploads(self, data):
+        """Yield (name, size, opener) for each uploaded file and each file inside the archive."""
+        for uploaded_file in data.get('files', []):
+            yield uploaded_file.name, uploaded_file.size, lambda uploaded_file=uploaded_file: uploaded_file
+        
+        archive = data.get('archive')
+        if archive:
+            with zipfile.ZipFile(archive) as zip_file:
+                for info in zip_file.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                        continue
+                    yield name, info.file_size, lambda info=info: zip_file.open(info)
 
-class DocumentListView(ListAPIView):
+class DocumentListView(ValuesListMixin, ListAPIView):
     serializer_class = DocumentSerializer
+    values_fields = DocumentSerializer.Meta.fields
     
     def get_queryset(self):
-        return Document.objects.filter(user=self.request.user)
+        return Document.objects.alive().filter(user=self.request.user)
 
 class DocumentDeleteView(APIView):
     
@@ -138,23 +277,13 @@ class DocumentDeleteView(APIView):
         responses={204: 'Document deleted successfully'}
     )
     def delete(self, request, document_id):
-        document = get_object_or_404(Document, id=document_id, user=request.user)
+        document = get_object_or_404(Document.objects.alive(), id=document_id, user=request.user)
         
         try:
-            # Clean up vector store files if they exist
-            import shutil
-            import os
-            from django.conf import settings
-            
-            if document.vector_store_id:
-                vector_store_path = os.path.join(
-                    settings.CHROMA_PERSIST_DIRECTORY, 
-                    document.vector_store_id
-                )
-                if os.path.exists(vector_store_path):
-                    shutil.rmtree(vector_store_path)
-            
-            document.delete()
+            # Soft-delete now; the vector store, file and row are reclaimed in the background
+            document.deleted_at = timezone.now()
+            document.save(update_fields=['deleted_at'])
+            schedule_reclaim(document.id)
             return Response(status=status.HTTP_204_NO_CONTENT)
             
         except Exception as e:
@@ -164,6 +293,61 @@ class DocumentDeleteView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class DocumentSearchView(APIView):
+    
+    @swagger_auto_schema(
+        query_serializer=SearchQuerySerializer,
+        responses={200: SearchHitSerializer(many=True)}
+    )
+    def get(self, request, document_id):
+        serializer = SearchQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        document = get_object_or_404(
+            Document.objects.alive(), 
+            id=document_id, 
+            user=request.user,
+            processed=True
+        )
+        
+        try:
+            # Retrieval only: embed the query and rank chunks, no LLM call
+            processor = DocumentProcessor()
+            started = time.time()
+            query_embedding = processor.embed_query(serializer.validated_data['q'])
+            embedded = time.time()
+            hits = processor.get_index(document.vector_store_id).search(
+                query_embedding,
+                k=serializer.validated_data['k']
+            )
+            ranked = time.time()
+            results = [
+                {
+                    'text': hit.text,
+                    'score': hit.score,
+                    'page': hit.metadata.get('page'),
+                    'start': hit.metadata.get('start'),
+                    'end': hit.metadata.get('end'),
+                }
+                for hit in hits
+            ]
+            
+            return Response({
+                'query': serializer.validated_data['q'],
+                'results': SearchHitSerializer(results, many=True).data,
+                # Embedding is an OpenAI round trip unless the query is cached; ranking is local
+                'embedding_ms': round((embedded - started) * 1000, 1),
+                'ranking_ms': round((ranked - embedded) * 1000, 1),
+            })
+            
+        except Exception as e:
+            logger.error(f"Error searching document: {str(e)}")
+            return Response(
+                {'error': 'Failed to search document'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 # Q&A Views
 class QAView(APIView):
     
@@ -179,44 +363,52 @@ class QAView(APIView):
             
             # Get document
             document = get_object_or_404(
-                Document, 
+                Document.objects.alive(), 
                 id=document_id, 
                 user=request.user,
                 processed=True
             )
             
-            try:
-                # Generate answer using AI
-                ai_service = AIServices()
-                result = ai_service.answer_question(document, question)
+            # Limit concurrent questions per user and overall (429 when saturated)
+            with admission.admit('qa', request.user.id):
+                try:
+                    # Generate answer using AI, joining an identical question already in flight
+                    started = time.time()
+                    result, shared = question_flight.do(
+                        (document.id, document.vector_store_id, normalize_question(question)),
+                        lambda: AIServices().answer_question(document, question)
+                    )
+                    response_time = time.time() - started if shared else result['response_time']
                 
-                # Save Q&A session
-                qa_session = QASession.objects.create(
-                    user=request.user,
-                    document=document,
-                    question=question,
-                    answer=result['answer'],
-                    confidence_score=result['confidence_score'],
-                    response_time=result['response_time']
-                )
+                    # Save Q&A session (one per caller, even when the answer was shared)
+                    qa_session = QASession.objects.create(
+                        user=request.user,
+                        document=document,
+                        question=question,
+                        answer=result['answer'],
+                        confidence_score=result['confidence_score'],
+                        response_time=response_time
+                    )
                 
-                return Response(QAResponseSerializer(qa_session).data)
+                    return Response(QAResponseSerializer(qa_session).data)
                 
-            except Exception as e:
-                logger.error(f"Error generating answer: {str(e)}")
-                return Response(
-                    {'error': 'Failed to generate answer'}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+                except Exception as e:
+                    logger.error(f"Error generating answer: {str(e)}")
+                    return Response(
+                        {'error': 'Failed to generate answer'}, 
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class QAHistoryView(ListAPIView):
+class QAHistoryView(ValuesListMixin, ListAPIView):
     serializer_class = QAHistorySerializer
+    values_fields = ('id', 'question', 'answer', 'confidence_score', 'created_at')
+    values_expressions = {'document_title': F('document__title')}
     
     def get_queryset(self):
         document_id = self.request.query_params.get('document_id')
-        queryset = QASession.objects.filter(user=self.request.user)
+        queryset = QASession.objects.filter(user=self.request.user, document__deleted_at__isnull=True)
         
         if document_id:
             queryset = queryset.filter(document_id=document_id)
@@ -227,4 +419,4 @@ class QAHistoryView(ListAPIView):
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def health_check(request):
-    return Response({'status': 'healthy'})
\ No newline at end of file
+    return Response({'status': 'healthy', 'qa_calls': question_flight.stats()})
\ No newline at end of file
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'qna_app.middleware.LargeResponseGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -163,20 +164,42 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Rest Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'qna_app.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': (
+        'qna_app.utils.fast_json.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'qna_app.utils.fast_json.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
 
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_SIZE = int(os.getenv('GZIP_MIN_SIZE', 1024))
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=2),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Tokens carry a hash of the password they were issued under and stop working when it changes
+    'CHECK_REVOKE_TOKEN': True,
+}
+
+# Users loaded by CachedJWTAuthentication are reused for TTL_SECONDS (0 disables the cache).
+# Saving or deleting a user clears the cache in every worker that shares STAMP_PATH.
+AUTH_USER_CACHE = {
+    'TTL_SECONDS': int(os.getenv('AUTH_USER_CACHE_TTL', 60)),
+    'MAX_SIZE': int(os.getenv('AUTH_USER_CACHE_SIZE', 10000)),
+    'STAMP_PATH': os.getenv('AUTH_USER_CACHE_STAMP', os.path.join(BASE_DIR, 'auth_cache.stamp')),
 }
 
 # CORS Configuration
@@ -191,14 +214,98 @@ CORS_ALLOW_CREDENTIALS = True
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# LLM routing: short factual questions and small contexts go to the fast model, the rest to the
+# large one; calls must finish within DEADLINE_SECONDS and are hedged past the model's p95.
+# BACKEND 'fake' swaps in local fake models for development and load testing.
+LLM_ROUTING = {
+    'BACKEND': os.getenv('LLM_BACKEND', 'openai'),
+    'MODELS': {
+        'fast': os.getenv('LLM_FAST_MODEL', 'gpt-4o-mini'),
+        'large': os.getenv('LLM_LARGE_MODEL', 'gpt-4'),
+    },
+    'DEADLINE_SECONDS': float(os.getenv('LLM_DEADLINE_SECONDS', 30)),
+    'SHORT_QUESTION_WORDS': 15,
+    'SMALL_CONTEXT_CHARS': 3000,
+    'HEDGE': os.getenv('LLM_HEDGE', 'True') == 'True',
+    'HEDGE_MIN_SAMPLES': 20,
+    'STATS_WINDOW': 200,
+    # How long a failing or too-slow model is routed around before it is probed again
+    'COOLDOWN_SECONDS': float(os.getenv('LLM_COOLDOWN_SECONDS', 30)),
+}
+
 # ChromaDB Configuration
 CHROMA_PERSIST_DIRECTORY = os.getenv('CHROMA_PERSIST_DIRECTORY', './chroma_db')
 
 
+# Chunking Configuration
+# Sizes are in characters, or in tokens when CHUNK_TOKEN_ENCODING names a tiktoken encoding (e.g. cl100k_base)
+CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 1000))
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', 200))
+CHUNK_TOKEN_ENCODING = os.getenv('CHUNK_TOKEN_ENCODING', '')
+
+# Recent query embeddings kept per process (search-as-you-type and repeated questions skip the API call)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 2048))
+# Shorter search queries are refused (400) rather than costing an embeddings call per keystroke
+SEARCH_MIN_QUERY_LENGTH = int(os.getenv('SEARCH_MIN_QUERY_LENGTH', 3))
+
+# Hierarchical retrieval: documents with at least this many chunks (0 disables) also get
+# a coarse index of section centroids, and queries only search chunks of the top sections
+HIERARCHICAL_INDEX_MIN_CHUNKS = int(os.getenv('HIERARCHICAL_INDEX_MIN_CHUNKS', 5000))
+HIERARCHICAL_SECTION_SIZE = int(os.getenv('HIERARCHICAL_SECTION_SIZE', 100))
+HIERARCHICAL_TOP_SECTIONS = int(os.getenv('HIERARCHICAL_TOP_SECTIONS', 8))
+
+# Embedding storage: float32 (Chroma), or float16/int8 compact matrices searched directly
+EMBEDDING_STORAGE = os.getenv('EMBEDDING_STORAGE', 'float32')
+# True also keeps a float32 copy of compact stores on disk, and the top
+# k * EMBEDDING_RESCORE_CANDIDATES candidates are re-scored exactly against it. This makes the
+# store larger than plain float32. Without it compact stores are searched in a single pass.
+EMBEDDING_RESCORE_CANDIDATES = int(os.getenv('EMBEDDING_RESCORE_CANDIDATES', 8))
+EMBEDDING_RESCORE_FULL_PRECISION = os.getenv('EMBEDDING_RESCORE_FULL_PRECISION', 'False') == 'True'
+
+
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+# Uploaded files larger than this are spooled to a temporary file instead of held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 2621440))  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 
+# Bulk upload: files per request (including ZIP entries) and threads used to process them
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', 500))
+BULK_UPLOAD_WORKERS = int(os.getenv('BULK_UPLOAD_WORKERS', 4))
+# Total uncompressed bytes per bulk request, and the largest compression ratio allowed for an
+# archive entry; both are checked against the ZIP directory before anything is written, and
+# request bodies larger than the total are refused before they are parsed
+BULK_UPLOAD_MAX_TOTAL_SIZE = int(os.getenv('BULK_UPLOAD_MAX_TOTAL_SIZE', 500 * 1024 * 1024))
+BULK_UPLOAD_MAX_COMPRESSION_RATIO = int(os.getenv('BULK_UPLOAD_MAX_COMPRESSION_RATIO', 100))
+# Chunks embedded per call when processing several documents
+EMBEDDING_BATCH_CHUNKS = int(os.getenv('EMBEDDING_BATCH_CHUNKS', 2000))
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+
+# Admission control: concurrent requests per user and in total (0 = unlimited) for Q&A and
+# ingestion, shared by all worker processes through a local SQLite file. Requests beyond the
+# limits wait up to MAX_WAIT seconds in a queue of QUEUE entries, then get 429 with Retry-After.
+ADMISSION_CONTROL = {
+    'DB_PATH': os.getenv('ADMISSION_DB_PATH', os.path.join(BASE_DIR, 'admission.sqlite3')),
+    # Renewed while a request holds its slot; only slots of crashed processes run out
+    'LEASE_SECONDS': 60,
+    'POOLS': {
+        'qa': {
+            'PER_USER': int(os.getenv('QA_MAX_CONCURRENT_PER_USER', 4)),
+            'GLOBAL': int(os.getenv('QA_MAX_CONCURRENT', 32)),
+            'QUEUE': 16,
+            'MAX_WAIT': 2.0,
+            'RETRY_AFTER': 5,
+        },
+        'ingest': {
+            'PER_USER': int(os.getenv('INGEST_MAX_CONCURRENT_PER_USER', 2)),
+            'GLOBAL': int(os.getenv('INGEST_MAX_CONCURRENT', 8)),
+            'QUEUE': 8,
+            'MAX_WAIT': 2.0,
+            'RETRY_AFTER': 30,
+        },
+    },
+}
+
 
 # Logging Configuration
 LOGGING = {